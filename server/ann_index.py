@@ -0,0 +1,119 @@
+"""
+Approximate nearest-neighbour index for large face galleries.
+
+An IVF (inverted file) partition written in NumPy: encodings are clustered
+with k-means into ``nlist`` cells, a query only visits the ``nprobe`` cells
+whose centroids are closest, and the candidates found there are reranked with
+exact float32 distances. Raising ``nprobe`` trades latency for recall;
+``nprobe == nlist`` is an exact search. Small galleries should not use an
+index at all, a brute-force GEMM is faster below a few thousand rows
+(see bench_ann.py for the crossover on a given machine).
+
+Training is the expensive step, so a gallery change does not retrain: kept
+rows keep their cells, only new rows are assigned to the existing centroids,
+and k-means runs again once the gallery has grown or shrunk by a set fraction
+since the centroids were trained (FaceGallery.build_index).
+"""
+
+import numpy as np
+
+
+def _sq_distances(queries, points, point_sq_norms=None):
+    if point_sq_norms is None:
+        point_sq_norms = np.einsum('ij,ij->i', points, points)
+    sq = np.einsum('ij,ij->i', queries, queries)[:, None] + point_sq_norms[None, :]
+    sq -= 2.0 * (queries @ points.T)
+    np.maximum(sq, 0.0, out=sq)
+    return sq
+
+
+def kmeans(points, nlist, iterations=10, sample_size=None, seed=0):
+    """Lloyd's k-means with k-means++ seeding on a random training sample"""
+    rng = np.random.default_rng(seed)
+    n = len(points)
+    if sample_size and n > sample_size:
+        points = points[rng.choice(n, sample_size, replace=False)]
+        n = sample_size
+    nlist = min(nlist, n)
+
+    centroids = np.empty((nlist, points.shape[1]), dtype=np.float32)
+    centroids[0] = points[rng.integers(n)]
+    closest = _sq_distances(points, centroids[:1])[:, 0]
+    for c in range(1, nlist):
+        total = closest.sum()
+        pick = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        centroids[c] = points[pick]
+        np.minimum(closest, _sq_distances(points, centroids[c:c + 1])[:, 0], out=closest)
+
+    for _ in range(iterations):
+        assign = np.argmin(_sq_distances(points, centroids), axis=1)
+        counts = np.bincount(assign, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, points)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, nlist=None, nprobe=8, iterations=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.size = 0
+        self.trained_size = 0  # Rows the centroids were trained on
+        self.centroids = None
+        self.cells = None  # cell of every row
+        self.order = None  # row ids grouped by cell
+        self.offsets = None  # cell c owns order[offsets[c]:offsets[c + 1]]
+
+    def build(self, encodings):
+        """Partition the first len(encodings) gallery rows, training new centroids"""
+        points = np.ascontiguousarray(encodings, dtype=np.float32)
+        n = len(points)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        self.centroids = kmeans(points, nlist, iterations=self.iterations,
+                                sample_size=256 * nlist, seed=self.seed)
+        self.trained_size = n
+        return self._partition(self.assign(points))
+
+    def assign(self, points):
+        """Cell (nearest centroid) of every row"""
+        cells = np.empty(len(points), dtype=np.int32)
+        # Assign in chunks to keep the distance matrix small on 50k-row galleries
+        for start in range(0, len(points), 8192):
+            chunk = points[start:start + 8192]
+            cells[start:start + len(chunk)] = np.argmin(_sq_distances(chunk, self.centroids), axis=1)
+        return cells
+
+    def subset(self, rows):
+        """Index over the given rows (renumbered from 0) with the same centroids; nothing is reassigned"""
+        return self._derive(self.cells[rows])
+
+    def extend(self, encodings):
+        """Index over the first len(encodings) rows that keeps this index's rows and only assigns the rows after them"""
+        points = np.ascontiguousarray(encodings[self.size:], dtype=np.float32)
+        return self._derive(np.concatenate((self.cells, self.assign(points))))
+
+    def _derive(self, cells):
+        # Indexes are shared with readers of a published gallery, so changes go into a new one
+        index = IVFIndex(nlist=self.nlist, nprobe=self.nprobe, iterations=self.iterations, seed=self.seed)
+        index.centroids = self.centroids
+        index.trained_size = self.trained_size
+        return index._partition(cells)
+
+    def _partition(self, cells):
+        self.cells = cells
+        self.order = np.argsort(cells, kind='stable')
+        counts = np.bincount(cells, minlength=len(self.centroids))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.size = len(cells)
+        return self
+
+    def candidates(self, query, nprobe=None):
+        """Row ids in the nprobe cells closest to a single query"""
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        cell_dist = _sq_distances(query[None, :], self.centroids)[0]
+        cells = np.argpartition(cell_dist, nprobe - 1)[:nprobe] if nprobe < len(cell_dist) else range(len(cell_dist))
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in cells])
@@ -1,21 +1,48 @@
 from flask import Flask, request, jsonify, Response, render_template_string
 from flask_cors import CORS
 import cv2
-import face_recognition
+import math
 import numpy as np
 import os
 import threading
 import time
-from datetime import datetime, date
+from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
 from pathlib import Path
-import requests
+from encoding_cache import EncodingCache
+from face_loader import load_student_encodings
+from face_descriptor import parse_descriptor, serialize_descriptor
+from gallery import FaceGallery
+from face_templates import TemplateLearner, compact_templates
+from pipeline import DropOldestQueue, QueueClosed
+from encoder_pool import FaceWorkerPool
+from attendance_ledger import PAGE_SIZE, AttendanceLedger, current_session
+from attendance_journal import AttendanceJournal
+from attendance_writer import AttendanceWriter
+from mjpeg import MjpegBroadcaster
+from detectors import parse_camera_detectors, detect_faces
+from cameras import CameraSource, FairFrameScheduler, parse_camera_sources, waiting_status
+from events import EventBus
+from pacing import DetectionPacer
+from motion import MotionGate
+from face_crops import crop_canvas
+from batch_encoder import encode_faces
+from batch import run_batch
+from metrics import (REGISTRY, ATTENDANCE_MARKS, ATTENDANCE_MARK_SECONDS, DB_ERRORS, DB_SECONDS, FACES_PER_FRAME,
+                     FRAMES_PROCESSED, LOAD_FACES_SECONDS, MATCH_DISTANCE, RECOGNITIONS, STAGE_SECONDS)
 
 # --- Load environment variables ---
 load_dotenv(dotenv_path=Path('.') / '.env')
 SUPABASE_URL = os.getenv('SUPABASE_URL', '').strip()
 SUPABASE_KEY = os.getenv('SUPABASE_KEY', '').strip()
+FACE_CACHE_PATH = os.getenv('FACE_CACHE_PATH', 'cache/face_encodings.npz').strip()
+FACE_DETECTOR = os.getenv('FACE_DETECTOR', 'hog').strip() or 'hog'
+ATTENDANCE_JOURNAL_PATH = os.getenv('ATTENDANCE_JOURNAL_PATH', 'data/attendance_journal.db').strip()
+BATCH_ROOT = os.getenv('BATCH_ROOT', 'recordings').strip() or 'recordings'
+BATCH_OUTPUT_DIR = os.getenv('BATCH_OUTPUT_DIR', 'results').strip() or 'results'
+BATCH_MAX_EVERY = 1000  # Frame stride limit for /batch jobs
+BATCH_MAX_GROUP = 64  # Frames per /batch task; their faces are encoded in one call
 
 # --- Flask App Setup ---
 app = Flask(__name__)
@@ -32,210 +59,626 @@ if SUPABASE_URL and SUPABASE_KEY:
 else:
     print("⚠️ Missing Supabase credentials.")
 
+STUDENT_COLUMNS = 'id, name, image_url, face_descriptor, updated_at'
+
+
+def select_all(query):
+    """
+    Run a select in PAGE_SIZE pages until a short page comes back.
+
+    `query` builds a fresh, stably ordered query builder for each page,
+    since PostgREST caps every response at PAGE_SIZE rows.
+    """
+    rows = []
+    start = 0
+    while True:
+        page = query().range(start, start + PAGE_SIZE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
 # --- Global Variables ---
 recognition_active = False
 recognition_thread = None
-known_face_encodings = []
-known_face_names = []
-known_face_ids = []
-known_face_image_urls = []
+sync_thread = None
+batch_jobs = {}
+
+current_recognized = waiting_status()
+event_bus = EventBus()
 
-current_recognized = {
-    'name': '',
-    'image_url': '',
-    'status': 'Waiting for recognition...'
-}
+def publish_status(camera=None):
+    """Refresh the /current snapshot and push the new status to event subscribers"""
+    if camera is not None:
+        current_recognized.update(camera.current, camera=camera.name)
+    event_bus.publish('recognition', dict(current_recognized))
 
 # --- Face Recognition System ---
 class FaceRecognitionSystem:
     def __init__(self):
-        self.video_capture = None
+        self.detector = FACE_DETECTOR  # hog, cnn (GPU), haar or yunet:<model.onnx>; see detectors.py
+        self.cameras = self.configure_cameras(os.getenv('CAMERA_SOURCES', ''), os.getenv('CAMERA_DETECTORS', ''))
+        self.streams = {name: MjpegBroadcaster(camera) for name, camera in self.cameras.items()}
+        self.scheduler = None
         self.last_recognition = {}
-        self.tolerance = 0.6  # Increased for faster matching
-        self.model = 'hog'  # 'cnn' if GPU
+        self.tolerance = 0.6  # face_recognition's default; full-resolution crops keep matches well inside it
         self.num_jitters = 0  # Reduced from 1 to 0 for speed
-        self.frame_lock = threading.Lock()
-        self.current_frame = None
-        self.frame_counter = 0
-        self.process_every_n_frames = 10  # Process every 10th frame only
+        self.detect_workers = 1  # Threads pulling the latest frame for detection/encoding
+        self.target_latency = 0.5  # Seconds from a face appearing to its match; pacing trades resolution for it
+        self.detect_cpu_budget = 0.5  # Share of one core each camera's detection may use
+        self.idle_detect_level = 2  # 320x240 while the scene is empty: HOG finds ~80 px faces, a quarter of the width
+        self.motion_gate = True  # Skip detection while the scene is still
+        self.motion_roi = True  # Detect only inside the changed region when nobody is tracked
+        self.face_processes = int(os.getenv('FACE_WORKER_PROCESSES', '0'))  # >0: detect/encode in worker processes
+        self.worker_pool = None
+        self.face_queue = None
+        self.encoding_cache = EncodingCache(FACE_CACHE_PATH)
+        self.encoding_cache.load()
+        self.download_workers = 16  # Concurrent photo downloads during load_faces
+        self.encode_workers = os.cpu_count() or 1  # Processes for photo encoding
+        self.encode_batch = 16  # Photos per batched descriptor call while every encode process is busy
+        self.last_load_report = None
+        self.backfill_thread = None
+        self.backfill_lock = threading.Lock()
+        self.backfill_pending = {}
+        self.backfill_retries = {}  # student id -> (row, failed attempts, monotonic time of the next try)
+        self.retry_backoff = 30  # Seconds before a failed photo is tried again, doubling per failure
+        self.max_retry_backoff = 3600
+        self.gallery = FaceGallery()
+        self.gallery_lock = threading.Lock()  # Serializes gallery writers; readers never lock
+        self.roster = {}  # student id -> updated_at of the row the gallery reflects
+        self.sync_cursor = None  # Highest students.updated_at applied to the gallery
+        self.sync_lock = threading.Lock()
+        self.sync_interval = 30  # Seconds between delta syncs while recognition runs
+        self.ann_min_gallery = 10000  # Exact search is faster below this many faces (see bench_ann.py)
+        self.ann_nprobe = 16  # IVF cells visited per face; higher = better recall, slower
+        self.ann_retrain_growth = 0.2  # Retrain IVF centroids once the gallery moves this fraction from their training size
+        self.gallery_quantization = 'int8'  # Compact scan copy below the IVF threshold: 'int8', 'float16' or None
+        self.quantize_min_gallery = 2000  # Smaller galleries keep the plain float32 scan (see bench_ann.py)
+        self.rerank_shortlist = 16  # Quantized candidates per face reranked with exact float32 distances
+        self.template_reduction = 'min'  # Per-student score over its templates: 'min' or 'mean'
+        self.max_templates = 5  # Photo template plus learned ones; compaction keeps the most diverse
+        self.template_learner = TemplateLearner()
+        self.attendance_ledger = AttendanceLedger(supabase)
+        self.attendance_journal = AttendanceJournal(ATTENDANCE_JOURNAL_PATH)
+        self.attendance_writer = AttendanceWriter(supabase, self.attendance_ledger, self.attendance_journal)
+
+    def start_attendance(self):
+        """Start the ledger reconciler and the journal replayer; only the server does, batch.py never marks attendance"""
+        self.attendance_ledger.start()
+        self.attendance_writer.start()
+
+    def swap_gallery(self, gallery):
+        """Index a fully built gallery and publish it with a single reference assignment"""
+        if gallery.build_index(min_size=self.ann_min_gallery, nprobe=self.ann_nprobe,
+                               retrain_growth=self.ann_retrain_growth) is None:
+            gallery.quantize(self.gallery_quantization, min_size=self.quantize_min_gallery,
+                             shortlist=self.rerank_shortlist)
+        self.gallery = gallery
+
+    def apply_gallery_changes(self, upserts, removed_ids=()):
+        """Copy-on-write update: recognition keeps matching the old gallery until the swap"""
+        with self.gallery_lock:
+            self.swap_gallery(self.gallery.with_changes(upserts, removed_ids))
+
+    def split_descriptors(self, students):
+        """Return (usable rows, rows needing a backfill) from students with face_descriptor"""
+        ready, stale = [], []
+        for student in students:
+            fresh, enc = parse_descriptor(student.get('face_descriptor'), student['image_url'])
+            if fresh:
+                if enc is not None and enc.ndim == 2:
+                    enc = compact_templates(enc, self.max_templates)
+                ready.append((student['id'], student['name'], student['image_url'], enc))
+            else:
+                stale.append(student)
+        return ready, stale
+
+    def advance_sync_cursor(self, students):
+        stamps = [student['updated_at'] for student in students if student.get('updated_at')]
+        if stamps:
+            self.sync_cursor = max([self.sync_cursor or ''] + stamps)
 
     def load_faces(self):
-        global known_face_encodings, known_face_names, known_face_ids, known_face_image_urls
+        started = time.perf_counter()
         try:
-            result = supabase.table('students').select('*').not_.is_('image_url', 'null').execute()
-            students = result.data
+            students = select_all(lambda: supabase.table('students').select(STUDENT_COLUMNS)
+                                  .not_.is_('image_url', 'null').order('id'))
+            DB_SECONDS.labels('students_select').observe(time.perf_counter() - started)
 
             if not students:
                 print("⚠️ No student images found.")
                 return False
 
-            known_face_encodings.clear()
-            known_face_names.clear()
-            known_face_ids.clear()
-            known_face_image_urls.clear()
-
-            for student in students:
-                try:
-                    image = requests.get(student['image_url'], timeout=5).content
-                    nparr = np.frombuffer(image, np.uint8)
-                    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                    # Resize image for faster processing
-                    rgb_img = cv2.resize(rgb_img, (0, 0), fx=0.5, fy=0.5)
-                    locs = face_recognition.face_locations(rgb_img, model=self.model, number_of_times_to_upsample=0)
-                    encs = face_recognition.face_encodings(rgb_img, locs, num_jitters=0)
-                    if encs:
-                        known_face_encodings.append(encs[0])
-                        known_face_names.append(student['name'])
-                        known_face_ids.append(student['id'])
-                        known_face_image_urls.append(student['image_url'])
-                except Exception as e:
-                    print(f"⚠️ Error loading {student['name']}: {e}")
-
-            print(f"✅ Loaded {len(known_face_encodings)} faces.")
+            # Stored descriptors are the primary source; only missing or stale rows need the photo
+            ready, stale = self.split_descriptors(students)
+            with self.gallery_lock:
+                self.swap_gallery(FaceGallery(reduction=self.template_reduction).with_changes(ready))
+                self.roster = {student['id']: student.get('updated_at') for student in students}
+                self.advance_sync_cursor(students)
+
+            print(f"✅ Loaded {len(self.gallery)} faces from stored descriptors.")
+            if stale:
+                self.start_backfill(stale)
+            LOAD_FACES_SECONDS.observe(time.perf_counter() - started)
             return True
         except Exception as e:
+            DB_ERRORS.labels('students_select').inc()
             print("❌ Supabase fetch error:", e)
             return False
 
-    def mark_attendance(self, student_id, name):
+    def sync_gallery(self):
+        """
+        Apply students added, changed or deleted since the last sync.
+
+        Changed rows are found through students.updated_at; deletions by
+        diffing the id list. Falls back to a full load when no sync has
+        happened yet.
+        """
+        with self.sync_lock:
+            if self.sync_cursor is None:
+                return {'full': True, 'ok': self.load_faces()}
+            return self.sync_delta()
+
+    def sync_delta(self):
+        started = time.perf_counter()
         try:
-            now = datetime.now()
-            today = date.today().isoformat()
-            session = "before_break" if now.hour < 12 else "end_of_day"
+            changed = select_all(lambda: supabase.table('students').select(STUDENT_COLUMNS)
+                                 .gte('updated_at', self.sync_cursor).order('updated_at').order('id'))
+            ids = select_all(lambda: supabase.table('students').select('id')
+                             .not_.is_('image_url', 'null').order('id'))
+            DB_SECONDS.labels('students_sync').observe(time.perf_counter() - started)
+        except Exception as e:
+            DB_ERRORS.labels('students_sync').inc()
+            print(f"❌ Gallery sync error: {e}")
+            return {'full': False, 'ok': False, 'error': str(e)}
+
+        roster_ids = {row['id'] for row in ids}
+        removed = (set(self.roster) - roster_ids) | {s['id'] for s in changed if not s.get('image_url')}
+        # The cursor is inclusive, so skip rows already applied at the same timestamp
+        changed = [s for s in changed if s.get('image_url') and s['id'] in roster_ids
+                   and self.roster.get(s['id']) != s.get('updated_at')]
+        ready, stale = self.split_descriptors(changed)
+        # Stale rows leave the gallery until their new photo is encoded
+        upserts = ready + [(s['id'], s['name'], s['image_url'], None) for s in stale]
+        # Their updated_at is already behind the cursor, so failed photos are retried from here
+        retries = self.due_backfill_retries(changed, removed)
+
+        if upserts or removed:
+            self.apply_gallery_changes(upserts, removed)
+        roster = {sid: self.roster.get(sid) for sid in roster_ids}
+        roster.update({s['id']: s.get('updated_at') for s in changed})
+        self.roster = roster
+        self.advance_sync_cursor(changed)
+        if stale or retries:
+            self.start_backfill(stale + retries)
+        if upserts or removed or retries:
+            print(f"🔄 Gallery sync: {len(ready)} updated, {len(stale)} queued for encoding, "
+                  f"{len(retries)} retried, {len(removed)} removed.")
+        return {'full': False, 'ok': True, 'updated': len(ready), 'encoding': len(stale), 'retrying': len(retries),
+                'removed': len(removed)}
+
+    def due_backfill_retries(self, changed, removed):
+        """Students whose photo failed to download or encode and whose backoff has expired"""
+        now = time.monotonic()
+        with self.backfill_lock:
+            # A newer row or a deletion supersedes the failed one
+            for sid in set(removed) | {s['id'] for s in changed}:
+                self.backfill_retries.pop(sid, None)
+            due = []
+            for sid, (student, attempts, retry_at) in self.backfill_retries.items():
+                if retry_at <= now:
+                    due.append(student)
+                    # Not handed out again while this attempt is running
+                    self.backfill_retries[sid] = (student, attempts, float('inf'))
+            return due
+
+    def complete_gallery(self, timeout=None):
+        """
+        Sync the gallery and wait until the descriptor backfill has finished.
+
+        Recognition can start on a partial gallery, batch jobs cannot. Returns
+        None when the sync fails, else the roster size, the students in the
+        gallery and how many have no descriptor (no face, or their photo
+        failed to download or encode).
+        """
+        if not self.sync_gallery()['ok']:
+            return None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            thread = self.backfill_thread
+            if thread is None or not thread.is_alive():
+                break
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            thread.join(remaining)
+        students, loaded = len(self.roster), self.gallery.student_count
+        return {'students': students, 'in_gallery': loaded, 'without_descriptor': students - loaded}
+
+    def sync_loop(self):
+        while recognition_active:
+            time.sleep(self.sync_interval)
+            if recognition_active:
+                self.sync_gallery()
+            self.apply_learned_templates()
+
+    def apply_learned_templates(self):
+        """Merge templates learned from confident live matches into the gallery and face_descriptor"""
+        learned = self.template_learner.drain()
+        if not learned:
+            return 0
+        updates = []
+        with self.gallery_lock:
+            gallery = self.gallery
+            for sid, encs in learned.items():
+                found = gallery.templates(sid)
+                # Students removed or waiting for a re-encode since the match are skipped
+                if found is None:
+                    continue
+                templates, name, image_url = found
+                updates.append((sid, name, image_url, compact_templates(np.vstack([templates] + encs),
+                                                                        self.max_templates)))
+            if updates:
+                self.swap_gallery(gallery.with_changes(updates))
+
+        # face_descriptor writes do not bump updated_at, so they do not come back through the delta sync
+        for sid, name, image_url, templates in updates:
+            started = time.perf_counter()
+            try:
+                supabase.table('students').update({
+                    'face_descriptor': serialize_descriptor(templates, image_url)
+                }).eq('id', sid).execute()
+                DB_SECONDS.labels('descriptor_update').observe(time.perf_counter() - started)
+            except Exception as e:
+                DB_ERRORS.labels('descriptor_update').inc()
+                print(f"⚠️ Could not store templates for {name}: {e}")
+        if updates:
+            print(f"🧠 Learned templates for {len(updates)} students.")
+        return len(updates)
+
+    def start_backfill(self, students):
+        """Compute and store descriptors for students whose column is missing or stale"""
+        with self.backfill_lock:
+            for student in students:
+                self.backfill_pending[student['id']] = student
+            if self.backfill_thread and self.backfill_thread.is_alive():
+                return
+            print(f"🔄 Backfilling descriptors for {len(self.backfill_pending)} students in the background...")
+            self.backfill_thread = threading.Thread(target=self.backfill_descriptors, daemon=True)
+            self.backfill_thread.start()
+
+    def backfill_descriptors(self):
+        while True:
+            with self.backfill_lock:
+                students = list(self.backfill_pending.values())
+                self.backfill_pending.clear()
+                if not students:
+                    self.backfill_thread = None
+                    return
+            try:
+                self.backfill_batch(students)
+            except Exception as e:
+                print(f"❌ Descriptor backfill error: {e}")
+
+    def backfill_batch(self, students):
+        loaded, report = load_student_encodings(
+            students, self.encoding_cache, detector=self.detector,
+            download_workers=self.download_workers, encode_workers=self.encode_workers,
+            encode_batch=self.encode_batch)
+        encodings = {student['id']: enc for student, enc in loaded}
+        failed = {failure['id'] for failure in report['failures']}
+        self.schedule_backfill_retries(students, failed)
+
+        upserts = []
+        for student in students:
+            if student['id'] in failed:
+                continue
+            enc = encodings.get(student['id'])
+            upserts.append((student['id'], student['name'], student['image_url'], enc))
+            try:
+                supabase.table('students').update({
+                    'face_descriptor': serialize_descriptor(enc, student['image_url'])
+                }).eq('id', student['id']).execute()
+            except Exception as e:
+                report['failures'].append({
+                    'id': student['id'], 'name': student['name'], 'stage': 'store', 'error': str(e)
+                })
+        # Students deleted while their photo was being encoded must not come back
+        upserts = [row for row in upserts if row[0] in self.roster]
+        self.apply_gallery_changes(upserts)
+        self.last_load_report = report
+
+        self.encoding_cache.prune(list(self.roster))
+        try:
+            self.encoding_cache.save()
+        except Exception as e:
+            print(f"⚠️ Could not write encoding cache: {e}")
+
+        timings = report['timings']
+        print(f"📦 Descriptor backfill: {report['cache_hits']} cached, {report['downloaded']} downloaded, "
+              f"{report['encoded']} encoded, {len(report['failures'])} failed "
+              f"(download {timings['download_s']}s, encode {timings['encode_s']}s, wall {timings['wall_s']}s)")
+        print(f"✅ Gallery now has {len(self.gallery)} faces.")
+
+    def schedule_backfill_retries(self, students, failed):
+        """Back off and retry students whose photo failed; forget the ones that went through"""
+        now = time.monotonic()
+        with self.backfill_lock:
+            for student in students:
+                sid = student['id']
+                if self.roster.get(sid) != student.get('updated_at'):
+                    continue  # Superseded by a newer row or deleted meanwhile
+                if sid not in failed:
+                    self.backfill_retries.pop(sid, None)
+                    continue
+                _, attempts, _ = self.backfill_retries.get(sid, (None, 0, None))
+                delay = min(self.retry_backoff * 2 ** attempts, self.max_retry_backoff)
+                self.backfill_retries[sid] = (student, attempts + 1, now + delay)
 
-            exists = supabase.table("attendance").select("id") \
-                .eq("student_id", student_id).eq("date", today).eq("session_type", session).execute()
+    def mark_attendance(self, student_id, name):
+        """Journal a mark for the background replayer; returns the local verdict immediately"""
+        started = time.perf_counter()
+        now = datetime.now()
+        today, session = current_session(now)
 
-            if exists.data:
+        try:
+            if not self.attendance_writer.submit(student_id, session, today, now.isoformat()):
+                ATTENDANCE_MARKS.labels('already_marked').inc()
                 print(f"ℹ️ Already marked: {name}")
                 return False
-
-            supabase.table("attendance").insert({
-                "student_id": student_id,
-                "session_type": session,
-                "date": today,
-                "timestamp": now.isoformat()
-            }).execute()
-
-            print(f"✅ Attendance marked: {name}")
-            return True
         except Exception as e:
+            ATTENDANCE_MARKS.labels('error').inc()
             print(f"❌ Attendance error for {name}: {e}")
             return False
-
-    def start_camera(self):
-        """Initialize and start camera capture"""
-        try:
-            # Try camera 0 first (most common)
-            self.video_capture = cv2.VideoCapture(0)
-            if not self.video_capture.isOpened():
-                # Try camera 1 if 0 fails
-                self.video_capture.release()
-                self.video_capture = cv2.VideoCapture(1)
-            
-            if self.video_capture.isOpened():
-                # Set lower resolution for better performance
-                self.video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
-                self.video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
-                self.video_capture.set(cv2.CAP_PROP_FPS, 15)  # Lower FPS
-                self.video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                print("✅ Camera initialized")
-                return True
-            
-            print("❌ No camera found")
-            return False
-        except Exception as e:
-            print(f"❌ Camera error: {e}")
-            return False
+        finally:
+            ATTENDANCE_MARK_SECONDS.observe(time.perf_counter() - started)
+
+        ATTENDANCE_MARKS.labels('marked').inc()
+        print(f"✅ Attendance marked: {name}")
+        event_bus.publish('attendance', {'student_id': student_id, 'name': name, 'date': today, 'session_type': session})
+        return True
+
+    def configure_cameras(self, spec, detector_spec=''):
+        """Build camera sources from CAMERA_SOURCES; defaults to device 0 with device 1 as fallback"""
+        sources = parse_camera_sources(spec)
+        detectors = parse_camera_detectors(detector_spec)
+        if not sources:
+            return {'0': CameraSource('0', 0, fallback=1, detector=detectors.get('0', self.detector))}
+        return {name: CameraSource(name, source, detector=detectors.get(name, self.detector))
+                for name, source in sources}
+
+    def default_camera(self):
+        return next(iter(self.cameras.values()))
 
     def recognize(self):
+        """Capture from every camera and share detect/encode workers and the match stage between them"""
         global recognition_active
         
-        if not self.start_camera():
+        cameras = [camera for camera in self.cameras.values() if camera.open()]
+        if not cameras:
             current_recognized["status"] = "❌ Camera not accessible"
+            publish_status()
             return
 
-        print("🎥 Recognition started.")
-        
-        while recognition_active:
-            try:
-                ret, frame = self.video_capture.read()
-                if not ret:
-                    continue
-
-                # Store current frame for video feed
-                with self.frame_lock:
-                    self.current_frame = frame.copy()
+        self.start_worker_pool()
+        # One detect thread per worker process, each feeding its own process
+        workers = len(self.worker_pool) if self.worker_pool is not None else self.detect_workers
+        self.scheduler = FairFrameScheduler(cameras)
+        self.face_queue = DropOldestQueue(maxsize=8 * len(cameras))
+        for camera in cameras:
+            pacer = DetectionPacer(target_latency=self.target_latency, cpu_budget=self.detect_cpu_budget,
+                                   idle_level=self.idle_detect_level)
+            motion = MotionGate() if self.motion_gate else None
+            camera.start(lambda: recognition_active, on_frame=self.scheduler.notify, pacer=pacer, motion=motion)
+        detectors = [threading.Thread(target=self.detect_loop, args=(i,), daemon=True) for i in range(workers)]
+        matcher = threading.Thread(target=self.match_loop, daemon=True)
+        for stage in detectors + [matcher]:
+            stage.start()
+
+        print(f"🎥 Recognition started on {len(cameras)} camera(s).")
+
+        # Capture threads run until recognition is toggled off (or a recorded file ends)
+        for camera in cameras:
+            camera.thread.join()
+
+        # Shut stages down in pipeline order so in-flight faces are still matched
+        for camera in cameras:
+            camera.stop()
+        self.scheduler.close()
+        for stage in detectors:
+            stage.join(timeout=5)
+        self.face_queue.close()
+        matcher.join(timeout=5)
+        print("🛑 Recognition stopped.")
 
-                # Only process face recognition every Nth frame
-                self.frame_counter += 1
-                if self.frame_counter % self.process_every_n_frames != 0:
-                    continue
+    def detect_locations(self, worker_index, rgb, detector=None):
+        """Face boxes in an RGB frame, in-thread or on this thread's worker process"""
+        detector = detector or self.detector
+        if self.worker_pool is not None:
+            return self.worker_pool.detect(worker_index, rgb, detector)
+        return detect_faces(rgb, detector)
+
+    def encode_faces(self, worker_index, rgb, locs):
+        """Encodings for the given boxes of an RGB image, in-thread or on this thread's worker process"""
+        if self.worker_pool is not None:
+            return self.worker_pool.encode_image(worker_index, rgb, locs)
+        return encode_faces(rgb, locs, self.num_jitters)
+
+    def start_worker_pool(self):
+        """Start the face worker processes once; they stay warm across recognition restarts"""
+        if self.face_processes <= 0 or self.worker_pool is not None:
+            return
+        try:
+            self.worker_pool = FaceWorkerPool(self.face_processes, detector=self.detector, num_jitters=self.num_jitters)
+            print(f"✅ Started {self.face_processes} face worker processes.")
+        except Exception as e:
+            print(f"⚠️ Face worker pool unavailable, detecting in-thread: {e}")
+            self.worker_pool = None
 
-                # Use much smaller frame for face recognition
-                small_frame = cv2.resize(frame, (160, 120))  # Very small for speed
+    def detect_loop(self, worker_index=0):
+        """Detect and encode faces on the latest frame whenever this worker is free"""
+        while True:
+            try:
+                item = self.scheduler.get(timeout=1)
+            except QueueClosed:
+                break
+            if item is None:
+                continue
+            camera, (frame_id, frame, roi) = item
+            pacer = camera.pacer
+            try:
+                # Detect on a downscaled frame; the pacer picks the size that meets the latency target
+                width, height = pacer.resolution
+                sx, sy = frame.shape[1] / width, frame.shape[0] / height
+                x0 = y0 = 0
+                region = frame
+                if roi is not None and self.motion_roi and not camera.tracker.active(time.time()):
+                    # Someone new moved into view: only the changed region can hold a new face
+                    x0, y0, x1, y1 = roi
+                    region = frame[y0:y1, x0:x1]
+                    width = max(1, round(region.shape[1] / sx))
+                    height = max(1, round(region.shape[0] / sy))
+                    sx, sy = region.shape[1] / width, region.shape[0] / height
+                small_frame = cv2.resize(region, (width, height))
                 rgb = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-                
-                # Faster face detection with fewer locations
-                locs = face_recognition.face_locations(rgb, model=self.model, number_of_times_to_upsample=0)
-                
-                if locs:  # Only compute encodings if faces found
-                    encs = face_recognition.face_encodings(rgb, locs, num_jitters=self.num_jitters)
-
-                    for enc in encs:
-                        # Use faster distance calculation
-                        distances = face_recognition.face_distance(known_face_encodings, enc)
-                        
-                        if distances.size > 0:
-                            best_match_idx = np.argmin(distances)
-                            if distances[best_match_idx] < self.tolerance:
-                                sid = known_face_ids[best_match_idx]
-                                name = known_face_names[best_match_idx]
-                                img_url = known_face_image_urls[best_match_idx]
-                                now = time.time()
-
-                                if sid not in self.last_recognition or now - self.last_recognition[sid] > 5:
-                                    marked = self.mark_attendance(sid, name)
-                                    current_recognized.update({
-                                        'name': name,
-                                        'image_url': img_url,
-                                        'status': '✅ Marked!' if marked else 'ℹ️ Already marked'
-                                    })
-                                    self.last_recognition[sid] = now
-                                break  # Stop after first match
 
+                started = time.perf_counter()
+                locs = self.detect_locations(worker_index, rgb, camera.detector)
+                elapsed = time.perf_counter() - started
+                pacer.record_detection(elapsed, len(locs), time.monotonic())
+                STAGE_SECONDS.labels(camera.name, 'detect').observe(elapsed)
+                FRAMES_PROCESSED.labels(camera.name).inc()
+                FACES_PER_FRAME.labels(camera.name).observe(len(locs))
+                if not locs:
+                    continue
+
+                # Track in full-frame coordinates so boxes stay comparable when the detection size changes
+                boxes = [(int(t * sy) + y0, int(r * sx) + x0, int(b * sy) + y0, int(l * sx) + x0)
+                         for t, r, b, l in locs]
+
+                # Only new, unidentified or due-for-reverification tracks are encoded
+                tracked = camera.tracker.update(boxes, time.time())
+                pending = [(track, box) for (track, needs), box in zip(tracked, boxes) if needs]
+                if pending:
+                    started = time.perf_counter()
+                    # Landmarks and encodings come from the full-resolution pixels around each box
+                    canvas, crop_boxes = crop_canvas(frame, [box for _, box in pending])
+                    encs = self.encode_faces(worker_index, canvas, crop_boxes)
+                    elapsed = time.perf_counter() - started
+                    pacer.record('encode', elapsed)
+                    STAGE_SECONDS.labels(camera.name, 'encode').observe(elapsed)
+                    self.face_queue.put((camera, frame_id, [track for track, _ in pending], encs))
             except Exception as e:
                 print(f"⚠️ Recognition error: {e}")
-            
-            time.sleep(0.1)  # Small delay
 
-        if self.video_capture:
-            self.video_capture.release()
-        print("🛑 Recognition stopped.")
+    def match_loop(self):
+        """Match encodings against the gallery and record attendance off the detection path"""
+        while True:
+            try:
+                item = self.face_queue.get(timeout=1)
+            except QueueClosed:
+                break
+            if item is None:
+                continue
+            camera, _, tracks, encs = item
+            try:
+                # Match every face of the frame against the whole gallery in one batched call
+                gallery = self.gallery
+                started = time.perf_counter()
+                matches = gallery.match(encs, k=2)
+                elapsed = time.perf_counter() - started
+                camera.pacer.record('match', elapsed)
+                STAGE_SECONDS.labels(camera.name, 'match').observe(elapsed)
+                now = time.time()
+                for track, enc, idx, dist, margin in zip(tracks, encs, matches.indices[:, 0],
+                                                         matches.distances[:, 0], matches.margins):
+                    if np.isfinite(dist):
+                        MATCH_DISTANCE.labels(camera.name).observe(float(dist))
+                    if dist >= self.tolerance:
+                        RECOGNITIONS.labels(camera.name, 'unknown').inc()
+                        camera.tracker.identify(track, None, dist, now)
+                        continue
+
+                    RECOGNITIONS.labels(camera.name, 'matched').inc()
+                    sid, name, img_url = gallery.student(idx)
+                    camera.tracker.identify(track, (sid, name, img_url), dist, now)
+                    self.template_learner.offer(sid, enc, dist, margin, now)
+                    if sid not in self.last_recognition or now - self.last_recognition[sid] > 5:
+                        marked = self.mark_attendance(sid, name)
+                        camera.current.update({
+                            'name': name,
+                            'image_url': img_url,
+                            'status': '✅ Marked!' if marked else 'ℹ️ Already marked'
+                        })
+                        publish_status(camera)
+                        self.last_recognition[sid] = now
+            except Exception as e:
+                print(f"⚠️ Match error: {e}")
 
-    def get_frame(self):
-        """Get current frame for video streaming"""
-        with self.frame_lock:
-            if self.current_frame is not None:
-                return self.current_frame.copy()
-        return None
+    def pipeline_stats(self):
+        stats = {
+            'cameras': {name: camera.stats() for name, camera in self.cameras.items()},
+            'streams': {name: stream.stats() for name, stream in self.streams.items()},
+        }
+        if self.scheduler is not None:
+            stats['frames_scheduled'] = dict(self.scheduler.served)
+        if self.face_queue is not None:
+            stats['face_queue'] = self.face_queue.stats()
+        if self.worker_pool is not None:
+            stats['workers'] = self.worker_pool.stats()
+        return stats
 
 face_system = FaceRecognitionSystem()
 
+# --- Metrics read at scrape time ---
+REGISTRY.callback('face_recognition_active', 'Whether the recognition loop is running',
+                  lambda: [((), int(recognition_active))])
+REGISTRY.callback('face_gallery_size', 'Faces in the gallery', lambda: [((), len(face_system.gallery))])
+REGISTRY.callback('face_gallery_students', 'Students in the gallery',
+                  lambda: [((), face_system.gallery.student_count)])
+REGISTRY.callback('face_templates_learned_total', 'Live encodings kept as extra student templates',
+                  lambda: [((), face_system.template_learner.stats()['learned'])], kind='counter')
+REGISTRY.callback('face_stream_clients', 'Connected /video_feed clients',
+                  lambda: [((name,), stream.subscribers) for name, stream in face_system.streams.items()], ['camera'])
+REGISTRY.callback('face_frames_dropped_total', 'Captured frames replaced before detection took them',
+                  lambda: [((name,), camera.frames.dropped) for name, camera in face_system.cameras.items()],
+                  ['camera'], kind='counter')
+REGISTRY.callback('face_queue_depth', 'Encodings waiting for the match stage',
+                  lambda: [((), len(face_system.face_queue))] if face_system.face_queue is not None else [])
+REGISTRY.callback('face_queue_dropped_total', 'Encodings dropped because the match stage fell behind',
+                  lambda: [((), face_system.face_queue.dropped)] if face_system.face_queue is not None else [],
+                  kind='counter')
+REGISTRY.callback('face_attendance_replay_backlog', 'Journaled attendance marks not yet written to Supabase',
+                  lambda: [((), face_system.attendance_journal.backlog())])
+REGISTRY.callback('face_attendance_parked', 'Journaled attendance marks the database rejected for good',
+                  lambda: [((), face_system.attendance_journal.failed_count())])
+REGISTRY.callback('face_detection_interval_seconds', 'Current paced interval between detections',
+                  lambda: [((name,), camera.pacer.interval) for name, camera in face_system.cameras.items()],
+                  ['camera'])
+REGISTRY.callback('face_worker_utilisation', 'Share of time each face worker process was busy',
+                  lambda: [((str(i),), w['utilisation']) for i, w in enumerate(face_system.worker_pool.stats())]
+                  if face_system.worker_pool is not None else [], ['worker'])
+
 # --- Routes ---
 
 @app.route('/toggle-recognition', methods=['POST'])
 def toggle_recognition():
-    global recognition_active, recognition_thread
+    global recognition_active, recognition_thread, sync_thread
     if not recognition_active:
-        if not face_system.load_faces():
+        # Already running when started from __main__; covers servers that only import the app
+        face_system.start_attendance()
+        # A gallery from an earlier run only needs the delta since then
+        if not face_system.sync_gallery()['ok']:
             return jsonify({'error': 'Failed to load student faces from database.'}), 500
         
         recognition_active = True
         recognition_thread = threading.Thread(target=face_system.recognize)
         recognition_thread.daemon = True
         recognition_thread.start()
+        if sync_thread is None or not sync_thread.is_alive():
+            sync_thread = threading.Thread(target=face_system.sync_loop, daemon=True)
+            sync_thread.start()
         return jsonify({'active': True, 'message': 'Face recognition started successfully!'})
     else:
         recognition_active = False
@@ -243,36 +686,156 @@ def toggle_recognition():
             recognition_thread.join(timeout=5)
         return jsonify({'active': False, 'message': 'Face recognition stopped.'})
 
+@app.route('/sync-gallery', methods=['POST'])
+def sync_gallery():
+    result = face_system.sync_gallery()
+    if not result['ok']:
+        return jsonify({'error': 'Gallery sync failed.', **result}), 500
+    result['faces_loaded'] = len(face_system.gallery)
+    return jsonify(result)
+
+def confined_path(root, path):
+    """Resolve a request path inside root; None if it is not a string or escapes root"""
+    if not isinstance(path, str) or not path.strip():
+        return None
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if resolved != root and not resolved.startswith(root + os.sep):
+        return None
+    return resolved
+
+@app.route('/batch', methods=['POST'])
+def start_batch():
+    """Reprocess recordings under BATCH_ROOT; results go to a JSONL/CSV file in BATCH_OUTPUT_DIR"""
+    data = request.get_json(silent=True) or {}
+    inputs, output = data.get('inputs'), data.get('output')
+    if not inputs or not output:
+        return jsonify({'error': 'inputs and output are required.'}), 400
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    if not isinstance(inputs, list):
+        return jsonify({'error': 'inputs must be a path or a list of paths.'}), 400
+    # Paths are relative to the configured directories and may not leave them
+    input_paths = [confined_path(BATCH_ROOT, path) for path in inputs]
+    if None in input_paths:
+        return jsonify({'error': f'inputs must be inside {BATCH_ROOT}.'}), 400
+    output_path = confined_path(BATCH_OUTPUT_DIR, output)
+    if output_path is None or output_path == os.path.realpath(BATCH_OUTPUT_DIR):
+        return jsonify({'error': f'output must be a file inside {BATCH_OUTPUT_DIR}.'}), 400
+    try:
+        every = int(data.get('every', 1))
+        min_hits = int(data.get('min_hits', 2))
+        group = int(data.get('group', 4))
+        workers = int(data['workers']) if data.get('workers') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'every, min_hits, group and workers must be integers.'}), 400
+    limits = {'every': (every, BATCH_MAX_EVERY), 'group': (group, BATCH_MAX_GROUP),
+              'workers': (workers, os.cpu_count() or 1)}
+    for name, (value, limit) in limits.items():
+        if value is not None and not 1 <= value <= limit:
+            return jsonify({'error': f'{name} must be between 1 and {limit}.'}), 400
+    if data.get('format') not in (None, 'jsonl', 'csv'):
+        return jsonify({'error': 'format must be jsonl or csv.'}), 400
+
+    job_id = f"batch-{len(batch_jobs) + 1}"
+    job = {'id': job_id, 'status': 'running', 'inputs': inputs, 'output': output, 'gallery': None,
+           'stats': None, 'error': None}
+    batch_jobs[job_id] = job
+
+    def run():
+        try:
+            # Students whose descriptors are still being backfilled would otherwise come out as unknown
+            job['gallery'] = face_system.complete_gallery()
+            if job['gallery'] is None:
+                raise RuntimeError('Failed to load student faces from database.')
+            if job['gallery']['without_descriptor']:
+                print(f"⚠️ Batch {job_id}: {job['gallery']['without_descriptor']} students have no usable descriptor.")
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            _, job['stats'] = run_batch(face_system, input_paths, output_path, data.get('format'),
+                                        every=every, workers=workers, min_hits=min_hits, group=group)
+            job['status'] = 'done'
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            print(f"❌ Batch {job_id} failed: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
+    return jsonify(job), 202
+
+@app.route('/batch/<job_id>')
+def batch_status(job_id):
+    job = batch_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown batch job: {job_id}'}), 404
+    return jsonify(job)
+
+def find_camera(cam):
+    if cam is None:
+        return face_system.default_camera()
+    return face_system.cameras.get(cam)
+
 @app.route('/video_feed')
-def video_feed():
-    def generate():
-        while recognition_active:
-            frame = face_system.get_frame()
-            if frame is not None:
-                try:
-                    # Resize for web display and compress more
-                    display_frame = cv2.resize(frame, (480, 360))
-                    ret, buffer = cv2.imencode('.jpg', display_frame, [cv2.IMWRITE_JPEG_QUALITY, 60])
-                    if ret:
-                        yield (b'--frame\r\n'
-                               b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-                except:
-                    pass
-            time.sleep(0.1)  # 10 FPS for web display
-    
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+@app.route('/video_feed/<cam>')
+def video_feed(cam=None):
+    camera = find_camera(cam)
+    if camera is None:
+        return jsonify({'error': f'Unknown camera: {cam}'}), 404
+
+    stream = face_system.streams[camera.name]
+    return Response(stream.subscribe(lambda: recognition_active),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/current')
 def current_status():
-    return jsonify(current_recognized)
+    # Read the sequence first so a client resuming from it can only see an event twice, never miss one
+    seq = event_bus.latest()
+    return jsonify({**current_recognized, 'seq': seq})
+
+@app.route('/events')
+def event_stream():
+    after = request.headers.get('Last-Event-ID') or request.args.get('after')
+    after = int(after) if after and after.isdigit() else event_bus.latest()
+    return Response(event_bus.stream(after), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/events/poll')
+def event_poll():
+    """Long-poll fallback for clients without EventSource"""
+    after = request.args.get('after', type=int)
+    if after is None:
+        after = event_bus.latest()
+    timeout = request.args.get('timeout', 25, type=float)
+    # nan would make the wait never time out
+    if not math.isfinite(timeout):
+        return jsonify({'error': 'timeout must be a finite number of seconds.'}), 400
+    timeout = min(max(timeout, 0.0), 60.0)
+    events, missed, seq = event_bus.wait(after, timeout)
+    return jsonify({'events': events, 'missed': missed, 'seq': seq})
+
+@app.route('/current/<cam>')
+def camera_status(cam):
+    camera = find_camera(cam)
+    if camera is None:
+        return jsonify({'error': f'Unknown camera: {cam}'}), 404
+    return jsonify(camera.current)
+
+@app.route('/cameras')
+def list_cameras():
+    return jsonify({name: camera.stats() for name, camera in face_system.cameras.items()})
 
 @app.route('/reset')
-def reset_status():
-    current_recognized.update({
-        'name': '',
-        'image_url': '',
-        'status': 'Waiting for recognition...'
-    })
+@app.route('/reset/<cam>')
+def reset_status(cam=None):
+    if cam is not None:
+        camera = find_camera(cam)
+        if camera is None:
+            return jsonify({'error': f'Unknown camera: {cam}'}), 404
+        camera.current.update(waiting_status())
+    else:
+        for camera in face_system.cameras.values():
+            camera.current.update(waiting_status())
+        current_recognized.update(waiting_status())
+    event_bus.publish('reset', {'camera': cam})
     return jsonify({'message': 'Status reset successfully'})
 
 @app.route('/camera')
@@ -628,7 +1191,9 @@ def serve_camera_ui():
 
     <script>
         let isRecognitionActive = false;
-        let updateInterval;
+        let streaming = false;
+        let eventSource = null;
+        let lastSeq = 0;
 
         function handleVideoError() {
             document.getElementById('camera-status').innerHTML = '❌ Camera Error';
@@ -711,22 +1276,52 @@ def serve_camera_ui():
             try {
                 const response = await fetch('/current');
                 const data = await response.json();
+                lastSeq = Math.max(lastSeq, data.seq || 0);
+                showRecognition(data);
+            } catch (error) {
+                console.error('Status update error:', error);
+            }
+        }
 
-                document.getElementById('student-name').textContent = 
-                    data.name || 'No student detected';
+        function handleEvent(event) {
+            lastSeq = Math.max(lastSeq, event.seq);
+            if (event.type === 'recognition') {
+                showRecognition(event.data);
+            } else if (event.type === 'reset') {
+                showRecognition({ status: 'Waiting for recognition...' });
+            }
+        }
 
-                const photo = document.getElementById('student-photo');
-                if (data.image_url) {
-                    photo.src = data.image_url;
-                    photo.classList.add('show');
-                } else {
-                    photo.classList.remove('show');
-                }
+        function showRecognition(data) {
+            document.getElementById('student-name').textContent = 
+                data.name || 'No student detected';
+
+            const photo = document.getElementById('student-photo');
+            if (data.image_url) {
+                photo.src = data.image_url;
+                photo.classList.add('show');
+            } else {
+                photo.classList.remove('show');
+            }
 
-                updateStatusDisplay(data.status || 'Waiting...', getStatusType(data.status));
+            updateStatusDisplay(data.status || 'Waiting...', getStatusType(data.status));
+        }
 
-            } catch (error) {
-                console.error('Status update error:', error);
+        async function longPoll() {
+            // Fallback for browsers without EventSource
+            while (streaming) {
+                try {
+                    const response = await fetch(`/events/poll?after=${lastSeq}`);
+                    const data = await response.json();
+                    if (data.missed) {
+                        await updateStatus();
+                    }
+                    data.events.forEach(handleEvent);
+                    lastSeq = Math.max(lastSeq, data.seq);
+                } catch (error) {
+                    console.error('Event poll error:', error);
+                    await new Promise(resolve => setTimeout(resolve, 3000));
+                }
             }
         }
 
@@ -744,13 +1339,28 @@ def serve_camera_ui():
             return 'waiting';
         }
 
-        function startStatusUpdates() {
-            updateInterval = setInterval(updateStatus, 3000);  // Every 3 seconds instead of 1.5
+        async function startStatusUpdates() {
+            if (streaming) return;
+            streaming = true;
+            // Snapshot first, then follow pushed events from its sequence number
+            await updateStatus();
+            if (!streaming) return;
+            if (window.EventSource) {
+                eventSource = new EventSource(`/events?after=${lastSeq}`);
+                ['recognition', 'reset'].forEach(type => {
+                    eventSource.addEventListener(type, e => handleEvent(JSON.parse(e.data)));
+                });
+                eventSource.addEventListener('missed', updateStatus);
+            } else {
+                longPoll();
+            }
         }
 
         function stopStatusUpdates() {
-            if (updateInterval) {
-                clearInterval(updateInterval);
+            streaming = false;
+            if (eventSource) {
+                eventSource.close();
+                eventSource = null;
             }
         }
 
@@ -795,7 +1405,7 @@ def serve_camera_ui():
         `;
         document.head.appendChild(style);
 
-        // Initialize with faster updates
+        // Follow recognition events as they happen
         startStatusUpdates();
         
         // Faster health check
@@ -822,16 +1432,30 @@ def serve_camera_ui():
     '''
     return render_template_string(html)
 
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health():
     return jsonify({
         'status': 'running',
         'supabase_connected': supabase is not None,
-        'faces_loaded': len(known_face_encodings),
-        'recognition_active': recognition_active
+        'faces_loaded': len(face_system.gallery),
+        'students_loaded': face_system.gallery.student_count,
+        'templates': face_system.template_learner.stats(),
+        'recognition_active': recognition_active,
+        'last_load': face_system.last_load_report,
+        'pipeline': face_system.pipeline_stats(),
+        'attendance_replay_backlog': face_system.attendance_journal.backlog(),
+        'attendance_writer': face_system.attendance_writer.stats(),
+        'attendance_ledger': face_system.attendance_ledger.stats(),
+        'event_seq': event_bus.latest()
     })
 
 # --- Run App ---
 if __name__ == '__main__':
+    # Replays marks journaled before a restart without waiting for recognition to start
+    face_system.start_attendance()
     print("🚀 Server running at http://localhost:5000/camera")
     app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
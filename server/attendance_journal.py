@@ -0,0 +1,122 @@
+"""
+Durable local write-ahead log for attendance marks.
+
+Every mark is committed to a SQLite journal (WAL mode, synchronous=FULL, so
+it is fsync'd) before anything is sent to Supabase. Marks survive network
+outages and server restarts; the replayer in attendance_writer.py drains
+unsent rows in batches. The journal is keyed by the daily-session key, so a
+student can only be journaled once per date and session. Marks the database
+rejects for good (e.g. a student deleted while the kiosk was offline) are
+parked as failed with the error text instead of blocking the rows behind them.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+UNSENT, SENT, FAILED = 0, 1, 2  # marks.sent
+
+
+class AttendanceJournal:
+    def __init__(self, path, keep_days=7):
+        self.path = path
+        self.keep_days = keep_days  # Sent rows older than this are pruned
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=FULL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS marks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                session_type TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                sent INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                UNIQUE (student_id, date, session_type)
+            )
+        ''')
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(marks)')}
+        if 'error' not in columns:
+            # Journals written before failed marks were parked
+            self.conn.execute('ALTER TABLE marks ADD COLUMN error TEXT')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_marks_unsent ON marks(sent, id)')
+
+    def append(self, student_id, day, session_type, timestamp):
+        """Durably record a mark; returns False if the daily-session key is already journaled"""
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT OR IGNORE INTO marks (student_id, date, session_type, timestamp) VALUES (?, ?, ?, ?)',
+                (student_id, day, session_type, timestamp))
+            return cursor.rowcount == 1
+
+    def pending(self, limit):
+        """Oldest unsent marks as (journal ids, attendance rows)"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, student_id, date, session_type, timestamp FROM marks '
+                'WHERE sent = ? ORDER BY id LIMIT ?', (UNSENT, limit)).fetchall()
+        ids = [row[0] for row in rows]
+        marks = [{
+            'student_id': row[1],
+            'date': row[2],
+            'session_type': row[3],
+            'timestamp': row[4],
+        } for row in rows]
+        return ids, marks
+
+    def mark_sent(self, ids):
+        if not ids:
+            return
+        with self.lock:
+            # One transaction, so one fsync per batch
+            self.conn.execute('BEGIN')
+            self.conn.executemany('UPDATE marks SET sent = ? WHERE id = ?', [(SENT, i) for i in ids])
+            self.conn.execute('COMMIT')
+
+    def mark_failed(self, ids, error):
+        """Park marks the database rejected so the replayer moves past them"""
+        if not ids:
+            return
+        with self.lock:
+            self.conn.execute('BEGIN')
+            self.conn.executemany('UPDATE marks SET sent = ?, error = ? WHERE id = ?',
+                                  [(FAILED, str(error), i) for i in ids])
+            self.conn.execute('COMMIT')
+
+    def failed(self, limit=20):
+        """Most recently parked marks, newest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT student_id, date, session_type, timestamp, error FROM marks '
+                'WHERE sent = ? ORDER BY id DESC LIMIT ?', (FAILED, limit)).fetchall()
+        return [{'student_id': row[0], 'date': row[1], 'session_type': row[2], 'timestamp': row[3], 'error': row[4]}
+                for row in rows]
+
+    def failed_count(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM marks WHERE sent = ?', (FAILED,)).fetchone()[0]
+
+    def marked_on(self, day):
+        """(student_id, session_type) of every mark journaled for a date, whether or not it reached Supabase"""
+        with self.lock:
+            return self.conn.execute(
+                'SELECT student_id, session_type FROM marks WHERE date = ?', (day,)).fetchall()
+
+    def backlog(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM marks WHERE sent = ?', (UNSENT,)).fetchone()[0]
+
+    def prune(self):
+        cutoff = (date.today() - timedelta(days=self.keep_days)).isoformat()
+        with self.lock:
+            self.conn.execute('DELETE FROM marks WHERE sent != ? AND date < ?', (UNSENT, cutoff))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
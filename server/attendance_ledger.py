@@ -0,0 +1,122 @@
+"""
+In-memory ledger of today's attendance.
+
+Holds the (student_id, date, session_type) keys already marked so that
+"already marked?" is an O(1) set lookup with no network I/O. The ledger is
+preloaded from the attendance table at start and whenever the session rolls
+over, updated locally on every mark, and periodically reconciled with the
+database so marks written by other kiosks are picked up.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from metrics import DB_ERRORS, DB_SECONDS
+
+PAGE_SIZE = 1000  # PostgREST default max rows per response
+
+
+def current_session(now=None):
+    """Return (date, session_type) for a moment, defaulting to now"""
+    now = now or datetime.now()
+    return now.date().isoformat(), "before_break" if now.hour < 12 else "end_of_day"
+
+
+class AttendanceLedger:
+    def __init__(self, client, reconcile_interval=60):
+        self.client = client
+        self.reconcile_interval = reconcile_interval  # Seconds between database reconciliations
+        self.lock = threading.Lock()
+        self.marked = {}  # (date, session_type) -> {student_id}
+        self.loaded = set()  # (date, session_type) keys preloaded from the database
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_reconciled = None
+        self.last_error = None
+
+    def add(self, student_id, day, session_type):
+        """Record a mark; returns False if it was already in the ledger"""
+        with self.lock:
+            students = self.marked.setdefault((day, session_type), set())
+            if student_id in students:
+                return False
+            students.add(student_id)
+            return True
+
+    def discard(self, student_id, day, session_type):
+        with self.lock:
+            self.marked.get((day, session_type), set()).discard(student_id)
+
+    def fetch(self, day, session_type):
+        """Student ids marked in the database for one day/session, paging through large days"""
+        students = set()
+        start = 0
+        while True:
+            rows = self.client.table('attendance').select('student_id') \
+                .eq('date', day).eq('session_type', session_type) \
+                .range(start, start + PAGE_SIZE - 1).execute().data or []
+            students.update(row['student_id'] for row in rows)
+            if len(rows) < PAGE_SIZE:
+                return students
+            start += PAGE_SIZE
+
+    def reconcile(self):
+        """Merge the database's marks for the current session into the ledger"""
+        day, session_type = current_session()
+        started = time.perf_counter()
+        try:
+            remote = self.fetch(day, session_type)
+            DB_SECONDS.labels('attendance_select').observe(time.perf_counter() - started)
+        except Exception as e:
+            DB_ERRORS.labels('attendance_select').inc()
+            self.last_error = str(e)
+            print(f"⚠️ Attendance ledger reconcile failed: {e}")
+            return False
+        with self.lock:
+            # Keep only today's sessions; anything older can never be marked again
+            self.marked = {key: value for key, value in self.marked.items() if key[0] == day}
+            self.loaded = {key for key in self.loaded if key[0] == day}
+            self.marked.setdefault((day, session_type), set()).update(remote)
+            self.loaded.add((day, session_type))
+        self.last_reconciled = datetime.now().isoformat()
+        self.last_error = None
+        return True
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        last_key = None
+        last_run = 0.0
+        while not self.stop_event.is_set():
+            key = current_session()
+            # Preload at start and on session rollover (retrying every few seconds), otherwise reconcile periodically
+            elapsed = time.monotonic() - last_run
+            if (key != last_key and elapsed >= 5) or elapsed >= self.reconcile_interval:
+                if self.reconcile():
+                    last_key = key
+                last_run = time.monotonic()
+            self.stop_event.wait(1.0)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def stats(self):
+        day, session_type = current_session()
+        with self.lock:
+            marked = len(self.marked.get((day, session_type), ()))
+            loaded = (day, session_type) in self.loaded
+        return {
+            'session': f"{day}/{session_type}",
+            'marked': marked,
+            'preloaded': loaded,
+            'last_reconciled': self.last_reconciled,
+            'last_error': self.last_error,
+        }
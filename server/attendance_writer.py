@@ -0,0 +1,158 @@
+"""
+Background attendance writer.
+
+The recognition loop only journals marks and gets an immediate local verdict
+from the AttendanceLedger; nothing on the hot path waits for Supabase.
+Every mark is committed to the local AttendanceJournal first, and a replayer
+thread drains unsent journal rows in bulk upserts against the
+idx_attendance_unique_daily_session unique index (duplicates are ignored by
+the database, so no pre-check select is needed). Batches that fail in
+transport, with a 5xx or with an authentication error are retried with
+exponential backoff and stay in the journal until they are accepted, so an
+outage delays marks instead of losing them. A batch the database rejects
+(any other 4xx, e.g. a foreign-key violation for a deleted student) is split
+in halves down to single rows, and only the rows rejected on their own are
+parked as failed in the journal, so one bad row cannot hold up the rest.
+"""
+
+import threading
+import time
+
+from attendance_ledger import current_session
+from metrics import DB_ERRORS, DB_SECONDS
+
+ATTENDANCE_CONFLICT = 'student_id,date,session_type'
+RETRYABLE_CODES = {'42501'}  # Permission denied: a key / RLS problem that affects every row alike
+
+
+def is_rejection(error):
+    """True when the database refused the request itself, so sending it again cannot succeed"""
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return 400 <= status < 500 and status not in (401, 403, 408, 429)
+    # postgrest's APIError carries the PostgreSQL / PostgREST error code instead of the HTTP status
+    code = getattr(error, 'code', None)
+    if not isinstance(code, str) or code in RETRYABLE_CODES or code.startswith('PGRST3'):
+        return False
+    return code[:2] in ('22', '23', '42') or code.startswith(('PGRST1', 'PGRST2'))
+
+
+class AttendanceWriter:
+    def __init__(self, client, ledger, journal, batch_size=100, flush_interval=0.25,
+                 backoff=0.5, max_backoff=30.0):
+        self.client = client
+        self.ledger = ledger
+        self.journal = journal
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # Seconds to wait for more marks before writing a batch
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.running = False
+        self.written = 0
+        self.duplicates = 0
+        self.retries = 0
+        self.rejected = 0
+        self.last_error = None
+
+    def submit(self, student_id, session_type, day, timestamp):
+        """Journal a mark; returns False when the ledger or the journal already has it for the day/session"""
+        if not self.ledger.add(student_id, day, session_type):
+            return False
+        try:
+            # The journal's unique key is the durable check; the ledger entry stays either way
+            if not self.journal.append(student_id, day, session_type, timestamp):
+                return False
+        except Exception:
+            self.ledger.discard(student_id, day, session_type)
+            raise
+        self.wakeup.set()
+        return True
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.journal.prune()
+        # Marks journaled before a restart count as marked today, sent or not, even if the ledger cannot preload
+        day, _ = current_session()
+        for student_id, session_type in self.journal.marked_on(day):
+            self.ledger.add(student_id, day, session_type)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the replayer; unsent marks stay in the journal for the next start"""
+        self.running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+
+    def run(self):
+        delay = self.backoff
+        while self.running:
+            ids, rows = self.journal.pending(self.batch_size)
+            if not rows:
+                self.wakeup.wait(1.0)
+                self.wakeup.clear()
+                # Give concurrent marks a moment to join the same batch
+                time.sleep(self.flush_interval)
+                continue
+            if self.replay(ids, rows):
+                delay = self.backoff
+            else:
+                self.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def replay(self, ids, rows):
+        """Write journaled marks, isolating rejected rows; returns False when the batch should be retried"""
+        try:
+            self.write(rows)
+        except Exception as e:
+            if not is_rejection(e):
+                return False
+            if len(rows) == 1:
+                self.journal.mark_failed(ids, e)
+                self.rejected += 1
+                print(f"❌ Attendance mark for {rows[0]['student_id']} rejected by the database, parked: {e}")
+                return True
+            half = len(rows) // 2
+            return self.replay(ids[:half], rows[:half]) and self.replay(ids[half:], rows[half:])
+        self.journal.mark_sent(ids)
+        return True
+
+    def write(self, rows):
+        """Upsert one batch; raises when the database did not accept it"""
+        started = time.perf_counter()
+        try:
+            result = self.client.table('attendance').upsert(
+                rows, on_conflict=ATTENDANCE_CONFLICT, ignore_duplicates=True).execute()
+            DB_SECONDS.labels('attendance_upsert').observe(time.perf_counter() - started)
+        except Exception as e:
+            DB_ERRORS.labels('attendance_upsert').inc()
+            if is_rejection(e):
+                raise
+            if self.last_error is None:
+                print(f"⚠️ Attendance replay paused, {self.journal.backlog()} marks journaled locally: {e}")
+            self.last_error = str(e)
+            raise
+        inserted = len(result.data or [])
+        self.written += inserted
+        self.duplicates += len(rows) - inserted
+        if self.last_error is not None:
+            print("✅ Attendance replay resumed.")
+        self.last_error = None
+
+    def stats(self):
+        return {
+            'replay_backlog': self.journal.backlog(),
+            'written': self.written,
+            'duplicates': self.duplicates,
+            'retries': self.retries,
+            'rejected': self.rejected,
+            'parked': self.journal.failed_count(),
+            'parked_marks': self.journal.failed(10),
+            'last_error': self.last_error,
+        }
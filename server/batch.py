@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Offline batch recognition for recorded videos and folders of snapshots.
+
+Frames are read from video files, images or directories (recursively) and
+go through the live engine's steps: detection on a downscale, encoding on
+full-resolution crops, and a batched match against the gallery. No pacing,
+motion gate or sleeps are applied. Every frame is processed unless --every
+asks for sampling, and one FaceWorkerPool process per core does the dlib
+work. Each task takes --group consecutive frames, so the face crops of the
+whole group are encoded in one batched descriptor call and matched at once.
+
+Per-frame matches are written as JSONL or CSV, followed by attendance
+candidates (students matched in at least --min-hits frames) and throughput
+statistics:
+
+    python batch.py lecture.mp4 snapshots/ -o results.jsonl
+    python batch.py gate/ -o results.csv --every 5 --workers 4
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from detectors import DEFAULT_DETECTOR, detect_faces
+from encoder_pool import FaceWorkerPool
+from batch_encoder import encode_faces
+from face_crops import crop_canvas_many
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v'}
+
+
+def expand_inputs(inputs):
+    """Video and image files named directly or found under directories, in a stable order"""
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS:
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def read_frames(inputs, every=1):
+    """Yield (source, frame_index, time_s, frame) for every `every`-th frame of each input"""
+    for path in expand_inputs(inputs):
+        if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"⚠️ Could not read image {path}")
+                continue
+            yield path, 0, None, frame
+            continue
+
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            print(f"⚠️ Could not open video {path}")
+            continue
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        index = 0
+        while True:
+            # grab() skips decoding of frames that are not sampled
+            if not capture.grab():
+                break
+            if index % every == 0:
+                ret, frame = capture.retrieve()
+                if ret:
+                    yield path, index, round(index / fps, 3) if fps > 0 else None, frame
+            index += 1
+        capture.release()
+
+
+class BatchRecognizer:
+    def __init__(self, gallery, tolerance=0.6, detector=DEFAULT_DETECTOR, num_jitters=0, workers=None,
+                 detect_width=320, min_hits=2, group=4):
+        self.gallery = gallery
+        self.tolerance = tolerance
+        self.detector = detector  # Detector spec, see detectors.py
+        self.num_jitters = num_jitters
+        self.workers = workers or os.cpu_count() or 1
+        self.detect_width = detect_width  # Width of the downscale detection runs on
+        self.min_hits = min_hits  # Frames a student must be matched in to become an attendance candidate
+        self.group = max(1, group)  # Frames per task; their faces are encoded and matched together
+        self.pool = None
+        self.local = threading.local()
+        self.worker_ids = itertools.count()
+        self.timings = {'detect_s': 0.0, 'encode_s': 0.0, 'match_s': 0.0}
+        self.timings_lock = threading.Lock()
+
+    def detect(self, worker_index, rgb):
+        if self.pool is not None:
+            return self.pool.detect(worker_index, rgb, self.detector)
+        return detect_faces(rgb, self.detector)
+
+    def encode(self, worker_index, rgb, locs):
+        if self.pool is not None:
+            return self.pool.encode_image(worker_index, rgb, locs)
+        return encode_faces(rgb, locs, self.num_jitters)
+
+    def add_timing(self, stage, seconds):
+        with self.timings_lock:
+            self.timings[stage] += seconds
+
+    def locate(self, worker, frame):
+        """Face boxes of a BGR frame in full-frame coordinates, detected on a downscale"""
+        scale = min(1.0, self.detect_width / frame.shape[1])
+        width, height = max(1, round(frame.shape[1] * scale)), max(1, round(frame.shape[0] * scale))
+        rgb = cv2.cvtColor(cv2.resize(frame, (width, height)), cv2.COLOR_BGR2RGB)
+
+        started = time.perf_counter()
+        locs = self.detect(worker, rgb)
+        self.add_timing('detect_s', time.perf_counter() - started)
+
+        sx, sy = frame.shape[1] / width, frame.shape[0] / height
+        return [(int(t * sy), int(r * sx), int(b * sy), int(l * sx)) for t, r, b, l in locs]
+
+    def process(self, items):
+        """Detect, encode and match the faces of a group of (source, frame_index, time_s, frame); returns their records"""
+        if not hasattr(self.local, 'worker'):
+            self.local.worker = next(self.worker_ids)
+        worker = self.local.worker
+
+        records, found = [], []
+        for source, frame_index, time_s, frame in items:
+            records.append({'source': source, 'frame': frame_index, 'time_s': time_s, 'faces': []})
+            found.append((frame, self.locate(worker, frame)))
+        boxes = [box for _, frame_boxes in found for box in frame_boxes]
+        if not boxes:
+            return records
+
+        started = time.perf_counter()
+        canvas, crop_boxes = crop_canvas_many(found)
+        encs = self.encode(worker, canvas, crop_boxes)
+        self.add_timing('encode_s', time.perf_counter() - started)
+
+        started = time.perf_counter()
+        matches = self.gallery.match(encs, k=2)
+        self.add_timing('match_s', time.perf_counter() - started)
+
+        owners = [record for record, (_, frame_boxes) in zip(records, found) for _ in frame_boxes]
+        for record, box, idx, dist, margin in zip(owners, boxes, matches.indices[:, 0], matches.distances[:, 0],
+                                                  matches.margins):
+            face = {'box': list(box), 'student_id': None, 'name': None,
+                    'distance': round(float(dist), 4) if np.isfinite(dist) else None,
+                    'margin': round(float(margin), 4) if np.isfinite(margin) else None}
+            if dist < self.tolerance:
+                face['student_id'], face['name'], _ = self.gallery.student(idx)
+            record['faces'].append(face)
+        return records
+
+    def run(self, inputs, writer, every=1):
+        """Stream all inputs through the engine in order; returns (candidates, stats)"""
+        if self.workers > 1:
+            self.pool = FaceWorkerPool(self.workers, detector=self.detector, num_jitters=self.num_jitters)
+        seen = {}
+        stats = {'frames': 0, 'faces': 0, 'matched_faces': 0}
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                in_flight = deque()
+
+                def drain(limit):
+                    # Results are written in input order, whatever order the workers finish in
+                    while len(in_flight) > limit:
+                        for record in in_flight.popleft().result():
+                            stats['frames'] += 1
+                            stats['faces'] += len(record['faces'])
+                            for face in record['faces']:
+                                if face['student_id'] is not None:
+                                    stats['matched_faces'] += 1
+                                    self.note_candidate(seen, record, face)
+                            writer.frame(record)
+
+                frames = read_frames(inputs, every)
+                while True:
+                    items = list(itertools.islice(frames, self.group))
+                    if not items:
+                        break
+                    in_flight.append(executor.submit(self.process, items))
+                    drain(2 * self.workers)
+                drain(0)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
+
+        elapsed = time.perf_counter() - started
+        candidates = [c for c in seen.values() if c['hits'] >= self.min_hits]
+        stats.update({
+            'candidates': len(candidates),
+            'wall_s': round(elapsed, 3),
+            'fps': round(stats['frames'] / elapsed, 2) if elapsed > 0 else 0.0,
+            'workers': self.workers,
+            'group': self.group,
+            **{stage: round(seconds, 3) for stage, seconds in self.timings.items()},
+        })
+        for candidate in candidates:
+            writer.candidate(candidate)
+        writer.stats(stats)
+        return candidates, stats
+
+    @staticmethod
+    def note_candidate(seen, record, face):
+        candidate = seen.get(face['student_id'])
+        if candidate is None:
+            seen[face['student_id']] = {
+                'student_id': face['student_id'],
+                'name': face['name'],
+                'hits': 1,
+                'best_distance': face['distance'],
+                'first_source': record['source'],
+                'first_frame': record['frame'],
+                'first_time_s': record['time_s'],
+            }
+            return
+        candidate['hits'] += 1
+        candidate['best_distance'] = min(candidate['best_distance'], face['distance'])
+
+
+class JsonlWriter:
+    """One JSON object per line: frames, then candidates, then a stats line"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def frame(self, record):
+        self.write({'type': 'frame', **record})
+
+    def candidate(self, candidate):
+        self.write({'type': 'candidate', **candidate})
+
+    def stats(self, stats):
+        self.write({'type': 'stats', **stats})
+
+    def write(self, obj):
+        self.file.write(json.dumps(obj) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class CsvWriter:
+    """One row per detected face; candidates go to a sibling *_candidates.csv"""
+
+    FACE_FIELDS = ['source', 'frame', 'time_s', 'top', 'right', 'bottom', 'left',
+                   'student_id', 'name', 'distance', 'margin']
+    CANDIDATE_FIELDS = ['student_id', 'name', 'hits', 'best_distance', 'first_source', 'first_frame', 'first_time_s']
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.rows = csv.DictWriter(self.file, fieldnames=self.FACE_FIELDS)
+        self.rows.writeheader()
+        stem, _ = os.path.splitext(path)
+        self.candidates_path = f"{stem}_candidates.csv"
+        self.candidates = []
+
+    def frame(self, record):
+        for face in record['faces']:
+            top, right, bottom, left = face['box']
+            self.rows.writerow({
+                'source': record['source'], 'frame': record['frame'], 'time_s': record['time_s'],
+                'top': top, 'right': right, 'bottom': bottom, 'left': left,
+                'student_id': face['student_id'], 'name': face['name'],
+                'distance': face['distance'], 'margin': face['margin'],
+            })
+
+    def candidate(self, candidate):
+        self.candidates.append(candidate)
+
+    def stats(self, stats):
+        with open(self.candidates_path, 'w', newline='', encoding='utf-8') as f:
+            rows = csv.DictWriter(f, fieldnames=self.CANDIDATE_FIELDS)
+            rows.writeheader()
+            rows.writerows(self.candidates)
+
+    def close(self):
+        self.file.close()
+
+
+def open_writer(path, fmt=None):
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    return CsvWriter(path) if fmt == 'csv' else JsonlWriter(path)
+
+
+def run_batch(face_system, inputs, output, fmt=None, every=1, workers=None, min_hits=2, detector=None, group=4):
+    """Run a batch job against the live system's current gallery and settings"""
+    recognizer = BatchRecognizer(face_system.gallery, tolerance=face_system.tolerance,
+                                 detector=detector or face_system.detector, num_jitters=face_system.num_jitters,
+                                 workers=workers, min_hits=min_hits, group=group)
+    writer = open_writer(output, fmt)
+    try:
+        return recognizer.run(inputs, writer, every=every)
+    finally:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='video files, images or directories')
+    parser.add_argument('-o', '--output', required=True, help='.jsonl or .csv output path')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='defaults to the output extension')
+    parser.add_argument('--every', type=int, default=1, help='process every Nth video frame')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='face worker processes')
+    parser.add_argument('--min-hits', type=int, default=2, help='frames needed for an attendance candidate')
+    parser.add_argument('--group', type=int, default=4, help='frames per task whose faces are encoded together')
+    parser.add_argument('--detector', help='detector spec (hog, haar, yunet:<model.onnx>); defaults to FACE_DETECTOR')
+    args = parser.parse_args()
+
+    # Imported here so the server module (and its Supabase setup) is only loaded for the CLI
+    from app import face_system
+
+    # Waits for the descriptor backfill, so students without a stored descriptor are not reported as unknown
+    coverage = face_system.complete_gallery()
+    if coverage is None:
+        raise SystemExit("❌ Failed to load student faces from database.")
+    print(f"✅ Gallery has {coverage['in_gallery']} of {coverage['students']} students.")
+    if coverage['without_descriptor']:
+        print(f"⚠️ {coverage['without_descriptor']} students have no usable descriptor "
+              f"(no face found, or the photo failed to download or encode).")
+    candidates, stats = run_batch(face_system, args.inputs, args.output, args.format,
+                                  every=max(1, args.every), workers=args.workers, min_hits=args.min_hits,
+                                  detector=args.detector, group=args.group)
+    print(f"✅ {stats['frames']} frames, {stats['faces']} faces, {len(candidates)} attendance candidates "
+          f"in {stats['wall_s']}s ({stats['fps']} fps) -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark of the recognition engine against a local Supabase stand-in.
+
+Builds synthetic galleries (students with stored face descriptors) in an
+in-process PostgREST fake, then times the server's own code paths:
+
+- load_faces: full gallery load through FaceRecognitionSystem.load_faces
+- detect / encode: face detection on the paced downscale and encoding of
+  full-resolution crops, on frames from --video or synthetic frames
+- match: batched gallery.match per frame
+- mark_attendance: the hot-path journal write, plus replay of the journal
+  into the fake attendance table
+
+Every stage reports p50/p95/p99 latency and operations per second. Save a
+run with --save and check a later one against it with --compare; the
+command exits non-zero when any p95 regressed by more than --threshold:
+
+    python bench.py --sizes 100 1000 10000 50000 --save baseline.json
+    python bench.py --sizes 100 1000 10000 50000 --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from bench_ann import PERSON_STD, PROBE_STD
+from gallery import ENCODING_SIZE
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """The subset of the postgrest query builder the server uses"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = []
+        self.negate = False
+        self.columns = None
+        self.window = None
+        self.ordering = []
+        self.write = None
+
+    def select(self, columns='*'):
+        self.columns = None if columns.strip() == '*' else [c.strip() for c in columns.split(',')]
+        return self
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def filter(self, test):
+        negate, self.negate = self.negate, False
+        self.filters.append((lambda row: not test(row)) if negate else test)
+        return self
+
+    def eq(self, column, value):
+        return self.filter(lambda row: row.get(column) == value)
+
+    def gte(self, column, value):
+        return self.filter(lambda row: row.get(column) is not None and row[column] >= value)
+
+    def is_(self, column, value):
+        return self.filter(lambda row: row.get(column) is None if value == 'null' else row.get(column) == value)
+
+    def order(self, column, desc=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        self.write = ('upsert', rows, on_conflict, ignore_duplicates)
+        return self
+
+    def update(self, values):
+        self.write = ('update', values)
+        return self
+
+    def execute(self):
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        self.client.requests += 1
+        rows = self.client.tables.setdefault(self.table, [])
+        if self.write and self.write[0] == 'upsert':
+            return FakeResponse(self.client.upsert(self.table, *self.write[1:]))
+        matched = [row for row in rows if all(test(row) for test in self.filters)]
+        if self.write:
+            for row in matched:
+                row.update(self.write[1])
+        for column, desc in reversed(self.ordering):
+            matched = sorted(matched, key=lambda row: str(row.get(column)), reverse=desc)
+        # Like PostgREST, never more than MAX_ROWS rows per response
+        start, end = self.window or (0, len(matched))
+        matched = matched[start:min(end, start + self.client.max_rows)]
+        if self.columns:
+            matched = [{c: row.get(c) for c in self.columns} for row in matched]
+        return FakeResponse(matched)
+
+
+class FakeSupabase:
+    """In-memory PostgREST stand-in with a fixed simulated round-trip latency"""
+
+    def __init__(self, latency=0.005, max_rows=1000):
+        self.latency = latency
+        self.max_rows = max_rows  # PostgREST's default db-max-rows
+        self.tables = {}
+        self.keys = {}
+        self.requests = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def upsert(self, table, rows, on_conflict, ignore_duplicates):
+        columns = on_conflict.split(',') if on_conflict else ['id']
+        existing = self.keys.setdefault(table, {})
+        written = []
+        for row in rows:
+            key = tuple(row.get(c) for c in columns)
+            if key in existing:
+                if ignore_duplicates:
+                    continue
+                existing[key].update(row)
+            else:
+                existing[key] = dict(row)
+                self.tables.setdefault(table, []).append(existing[key])
+            written.append(dict(row))
+        return written
+
+
+def percentiles(samples):
+    samples = np.asarray(samples, dtype=np.float64)
+    total = float(samples.sum())
+    return {
+        'n': int(len(samples)),
+        'p50_ms': round(float(np.percentile(samples, 50)) * 1000, 3),
+        'p95_ms': round(float(np.percentile(samples, 95)) * 1000, 3),
+        'p99_ms': round(float(np.percentile(samples, 99)) * 1000, 3),
+        'ops_per_s': round(len(samples) / total, 2) if total > 0 else None,
+    }
+
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def synthetic_students(size, rng, serialize_descriptor):
+    encodings = rng.normal(0.0, PERSON_STD, (size, ENCODING_SIZE)).astype(np.float32)
+    stamp = datetime(2026, 1, 1)
+    students = []
+    for i, enc in enumerate(encodings):
+        url = f"https://example.invalid/students/{i}.jpg"
+        students.append({
+            'id': f"student-{i}",
+            'name': f"Student {i}",
+            'image_url': url,
+            'face_descriptor': serialize_descriptor(enc, url),
+            'updated_at': (stamp + timedelta(seconds=i)).isoformat(),
+        })
+    return students, encodings
+
+
+def synthetic_frames(count, rng, size=(480, 640)):
+    # Smooth gradients plus noise give HOG realistic work without any faces
+    base = np.linspace(0, 255, size[1], dtype=np.float32)[None, :, None]
+    return [np.clip(base + rng.normal(0, 25, size + (3,)), 0, 255).astype(np.uint8) for _ in range(count)]
+
+
+def video_frames(path, count):
+    import cv2
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def bench_gallery(app, size, rng, args, results):
+    from face_descriptor import serialize_descriptor
+
+    fake = app.supabase
+    students, encodings = synthetic_students(size, rng, serialize_descriptor)
+    fake.tables['students'] = students
+    system = app.face_system
+
+    def load():
+        if not system.load_faces():
+            raise RuntimeError('load_faces failed')
+        if system.gallery.student_count != size:
+            raise RuntimeError(f"load_faces loaded {system.gallery.student_count} of {size} students")
+
+    results[f"load_faces/{size}"] = percentiles(timed(load, args.repeats))
+
+    targets = rng.integers(size, size=(args.frames, args.faces))
+    probes = encodings[targets] + rng.normal(0.0, PROBE_STD, (args.frames, args.faces, ENCODING_SIZE))
+    gallery = system.gallery
+    samples = []
+    for frame in probes.astype(np.float32):
+        started = time.perf_counter()
+        gallery.match(frame, k=2)
+        samples.append(time.perf_counter() - started)
+    results[f"match/{size}"] = percentiles(samples)
+
+
+def bench_vision(app, frames, args, results):
+    try:
+        import cv2
+        import face_recognition
+    except ImportError as e:
+        print(f"⚠️ Skipping detect/encode: {e}")
+        return
+    from batch_encoder import encode_faces
+    from detectors import detect_faces
+    from face_crops import crop_canvas, crop_canvas_many
+    from pacing import RESOLUTIONS
+
+    system = app.face_system
+    width, height = RESOLUTIONS[args.detect_level]
+    detect, encode, per_face, batched = [], [], [], []
+    for frame in frames:
+        rgb = cv2.cvtColor(cv2.resize(frame, (width, height)), cv2.COLOR_BGR2RGB)
+        started = time.perf_counter()
+        detect_faces(rgb, system.detector)
+        detect.append(time.perf_counter() - started)
+
+        # A centred face-sized box, so encoding is timed whether or not the frame has faces
+        h, w = frame.shape[:2]
+        box = (h // 2 - h // 6, w // 2 + h // 6, h // 2 + h // 6, w // 2 - h // 6)
+        started = time.perf_counter()
+        canvas, boxes = crop_canvas(frame, [box])
+        encode_faces(canvas, boxes, system.num_jitters)
+        encode.append(time.perf_counter() - started)
+
+        # Eight crops (e.g. a group of batch-mode frames) encoded one call per face vs. one batched call
+        canvas, boxes = crop_canvas_many([(frame, [box])] * 8)
+        started = time.perf_counter()
+        for face in boxes:
+            face_recognition.face_encodings(canvas, [face], num_jitters=system.num_jitters)
+        per_face.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        encode_faces(canvas, boxes, system.num_jitters)
+        batched.append(time.perf_counter() - started)
+    results[f"detect/{width}x{height}"] = percentiles(detect)
+    results['encode/1-face'] = percentiles(encode)
+    results['encode/8-faces-per-face'] = percentiles(per_face)
+    results['encode/8-faces-batched'] = percentiles(batched)
+    results['frame/detect+encode'] = percentiles(np.add(detect, encode))
+
+
+def bench_attendance(app, tmpdir, args, results):
+    from attendance_journal import AttendanceJournal
+    from attendance_ledger import AttendanceLedger
+    from attendance_writer import AttendanceWriter
+
+    system = app.face_system
+    fake = app.supabase
+    ledger = AttendanceLedger(fake)
+    journal = AttendanceJournal(os.path.join(tmpdir, 'bench_journal.db'))
+    writer = AttendanceWriter(fake, ledger, journal)
+    system.attendance_ledger, system.attendance_journal, system.attendance_writer = ledger, journal, writer
+    writer.start()
+
+    students = [(f"student-{i}", f"Student {i}") for i in range(args.marks)]
+    samples = []
+    started_all = time.perf_counter()
+    for sid, name in students:
+        started = time.perf_counter()
+        system.mark_attendance(sid, name)
+        samples.append(time.perf_counter() - started)
+    results['mark_attendance'] = percentiles(samples)
+
+    # Replay: time until every journaled mark reached the fake attendance table
+    deadline = time.monotonic() + 60
+    while journal.backlog() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    replay_s = time.perf_counter() - started_all
+    writer.stop()
+    results['attendance_replay'] = {
+        'n': len(students),
+        'total_s': round(replay_s, 3),
+        'ops_per_s': round(len(students) / replay_s, 2) if replay_s > 0 else None,
+        'backlog_left': journal.backlog(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print p95 deltas against a saved run; returns the keys that regressed"""
+    regressions = []
+    print(f"\n{'stage':<26} {'base p95':>10} {'p95':>10} {'delta':>8}")
+    for key, current in results.items():
+        base = baseline.get('results', {}).get(key)
+        if not base or 'p95_ms' not in current or not base.get('p95_ms'):
+            continue
+        delta = (current['p95_ms'] - base['p95_ms']) / base['p95_ms']
+        flag = ''
+        if delta > threshold:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print(f"{key:<26} {base['p95_ms']:>10.3f} {current['p95_ms']:>10.3f} {delta:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+    parser.add_argument('--repeats', type=int, default=5, help='load_faces runs per gallery size')
+    parser.add_argument('--frames', type=int, default=200, help='frames matched / detected per measurement')
+    parser.add_argument('--faces', type=int, default=2, help='faces per matched frame')
+    parser.add_argument('--video', help='recorded video to take frames from instead of synthetic ones')
+    parser.add_argument('--detect-level', type=int, default=0, help='index into pacing.RESOLUTIONS')
+    parser.add_argument('--marks', type=int, default=500, help='attendance marks to time')
+    parser.add_argument('--latency', type=float, default=0.005, help='simulated Supabase round trip (s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write results as JSON')
+    parser.add_argument('--compare', help='JSON from an earlier --save to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='p95 increase that counts as a regression')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='face-bench-')
+    # Keep the server away from real credentials, caches and journals
+    os.environ['SUPABASE_URL'] = ''
+    os.environ['SUPABASE_KEY'] = ''
+    os.environ['FACE_CACHE_PATH'] = os.path.join(tmpdir, 'face_encodings.npz')
+    os.environ['ATTENDANCE_JOURNAL_PATH'] = os.path.join(tmpdir, 'attendance_journal.db')
+    os.environ['FACE_WORKER_PROCESSES'] = '0'
+    import app
+
+    app.supabase = FakeSupabase(latency=args.latency)
+
+    rng = np.random.default_rng(args.seed)
+    results = {}
+    for size in args.sizes:
+        bench_gallery(app, size, rng, args, results)
+    frames = video_frames(args.video, args.frames) if args.video else synthetic_frames(min(args.frames, 50), rng)
+    bench_vision(app, frames, args, results)
+    bench_attendance(app, tmpdir, args, results)
+
+    print(f"\n{'stage':<26} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>10}")
+    for key, stats in results.items():
+        if 'p50_ms' in stats:
+            print(f"{key:<26} {stats['n']:>6} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+                  f"{stats['p99_ms']:>10.3f} {stats['ops_per_s'] or 0:>10.1f}")
+        else:
+            print(f"{key:<26} {stats['n']:>6} {'total ' + str(stats['total_s']) + 's':>32} {stats['ops_per_s'] or 0:>10.1f}")
+
+    run = {
+        'meta': {
+            'time': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"\n💾 Saved results to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} stage(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions.")
+
+
+if __name__ == '__main__':
+    main()
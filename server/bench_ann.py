@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark exact, quantized and IVF gallery search on synthetic encodings.
+
+Prints per-frame match latency, recall@1, the share of faces whose match
+decision (student or unknown at --tolerance) agrees with the exact scan and
+the bytes per face each scan reads, for several gallery sizes, quantization
+kinds and nprobe settings, plus the smallest gallery size at which the index
+beats the brute-force scan. Use it to pick ann_min_gallery / ann_nprobe /
+gallery_quantization for a machine:
+
+    python bench_ann.py --sizes 1000 5000 20000 50000 --nprobe 4 8 16
+    python bench_ann.py --quantize int8 float16 --shortlist 8 16 32
+    python bench_ann.py --templates 5   # cost of several templates per student
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from gallery import ENCODING_SIZE, FaceGallery
+from quantize import KINDS
+
+# Spreads chosen so that different people sit ~0.9 apart and the same person
+# ~0.35 apart, roughly what dlib encodings look like
+PERSON_STD = 0.9 / np.sqrt(2 * ENCODING_SIZE)
+PROBE_STD = 0.35 / np.sqrt(ENCODING_SIZE)
+
+
+def synthetic_gallery(size, rng, templates=1):
+    """`size` students; beyond the first, each template is another noisy sample of the same face"""
+    encodings = rng.normal(0.0, PERSON_STD, (size, ENCODING_SIZE)).astype(np.float32)
+    gallery = FaceGallery(capacity=size * templates)
+    for i, enc in enumerate(encodings):
+        extra = enc + rng.normal(0.0, PROBE_STD, (templates - 1, ENCODING_SIZE)).astype(np.float32)
+        gallery.add(i, f"student-{i}", '', np.vstack([enc, extra]))
+    return gallery, encodings
+
+
+def time_matches(gallery, frames, **kwargs):
+    started = time.perf_counter()
+    results = [gallery.match(frame, k=2, **kwargs) for frame in frames]
+    elapsed = (time.perf_counter() - started) / len(frames)
+    top = np.concatenate([r.indices[:, 0] for r in results])
+    return elapsed, top, np.concatenate([r.distances[:, 0] for r in results])
+
+
+def decisions(top, dist, tolerance):
+    """Matched row per face, or -1 when the best distance is outside the tolerance"""
+    return np.where(dist < tolerance, top, -1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2000, 5000, 10000, 20000, 50000])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16])
+    parser.add_argument('--frames', type=int, default=200, help='frames matched per measurement')
+    parser.add_argument('--faces', type=int, default=2, help='faces per frame')
+    parser.add_argument('--quantize', nargs='*', default=list(KINDS), choices=KINDS)
+    parser.add_argument('--shortlist', type=int, nargs='+', default=[16], help='quantized candidates reranked')
+    parser.add_argument('--impostors', type=float, default=0.2, help='share of probe faces not in the gallery')
+    parser.add_argument('--tolerance', type=float, default=0.6)
+    parser.add_argument('--min-recall', type=float, default=0.99)
+    parser.add_argument('--templates', type=int, default=1, help='templates per student')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'size':>7} {'mode':>11} {'build ms':>9} {'match ms':>9} {'recall@1':>9} {'decisions':>10} {'B/face':>7}")
+    crossover = {}
+
+    for size in args.sizes:
+        gallery, encodings = synthetic_gallery(size, rng, max(1, args.templates))
+        targets = rng.integers(size, size=(args.frames, args.faces))
+        frames = encodings[targets] + rng.normal(0.0, PROBE_STD, (args.frames, args.faces, ENCODING_SIZE))
+        impostor = rng.random((args.frames, args.faces)) < args.impostors
+        frames[impostor] = rng.normal(0.0, PERSON_STD, (int(impostor.sum()), ENCODING_SIZE))
+        # A matched student is reported by the row of its first template
+        truth = np.where(impostor, -1, gallery.segments()[targets]).reshape(-1)
+        genuine = truth >= 0
+
+        exact_s, exact_top, exact_dist = time_matches(gallery, frames, exact=True)
+        exact_decisions = decisions(exact_top, exact_dist, args.tolerance)
+        exact_bytes = gallery.encodings.itemsize * ENCODING_SIZE
+
+        def report(mode, build_ms, elapsed, top, dist, scanned_bytes):
+            recall = np.mean(top[genuine] == exact_top[genuine])
+            agree = np.mean(decisions(top, dist, args.tolerance) == exact_decisions)
+            print(f"{size:>7} {mode:>11} {build_ms:>9} {elapsed * 1000:>9.3f} {recall:>9.3f} {agree:>10.4f} "
+                  f"{scanned_bytes:>7}")
+
+        print(f"{size:>7} {'exact':>11} {'-':>9} {exact_s * 1000:>9.3f} "
+              f"{np.mean(exact_top[genuine] == truth[genuine]):>9.3f} {1:>10.4f} {exact_bytes:>7}")
+
+        for kind in args.quantize:
+            for shortlist in args.shortlist:
+                started = time.perf_counter()
+                quantized = gallery.quantize(kind, min_size=0, shortlist=shortlist)
+                build_ms = f"{(time.perf_counter() - started) * 1000:.1f}"
+                elapsed, top, dist = time_matches(gallery, frames)
+                report(f"{kind}/{shortlist}", build_ms, elapsed, top, dist, quantized.nbytes // len(gallery))
+        gallery.quantize(None)
+
+        started = time.perf_counter()
+        gallery.build_index(min_size=0)
+        build_ms = (time.perf_counter() - started) * 1000
+        for nprobe in args.nprobe:
+            ivf_s, ivf_top, ivf_dist = time_matches(gallery, frames, nprobe=nprobe)
+            recall = np.mean(ivf_top[genuine] == exact_top[genuine])
+            agree = np.mean(decisions(ivf_top, ivf_dist, args.tolerance) == exact_decisions)
+            print(f"{size:>7} {'ivf/' + str(nprobe):>11} {build_ms:>9.1f} {ivf_s * 1000:>9.3f} {recall:>9.3f} "
+                  f"{agree:>10.4f} {'-':>7}")
+            if recall >= args.min_recall and ivf_s < exact_s and nprobe not in crossover:
+                crossover[nprobe] = size
+
+    print()
+    for nprobe in args.nprobe:
+        if nprobe in crossover:
+            print(f"nprobe={nprobe}: IVF is faster from {crossover[nprobe]} faces "
+                  f"(recall >= {args.min_recall})")
+        else:
+            print(f"nprobe={nprobe}: exact search wins at every tested size")
+
+
+if __name__ == '__main__':
+    main()
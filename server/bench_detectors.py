@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Compare face detector backends on the same frames.
+
+Every detector runs on identical downscaled frames from videos, images or
+directories. Per-frame latency (p50/p95) is reported, plus recall against a
+reference detector: a reference face counts as found when a detection
+overlaps it with IoU >= --iou. Use it to pick FACE_DETECTOR /
+CAMERA_DETECTORS for a camera:
+
+    python bench_detectors.py lecture.mp4 --detectors hog haar yunet:models/face_detection_yunet.onnx
+    python bench_detectors.py gate/ --reference hog:1 --size 480x360
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from batch import read_frames
+from detectors import make_detector
+from tracker import iou
+
+
+def matched_faces(reference, found, threshold):
+    """Greedy one-to-one IoU matching; returns how many reference boxes were found"""
+    pairs = sorted(((iou(r, f), ri, fi) for ri, r in enumerate(reference) for fi, f in enumerate(found)),
+                   reverse=True)
+    used_r, used_f = set(), set()
+    for score, ri, fi in pairs:
+        if score < threshold:
+            break
+        if ri in used_r or fi in used_f:
+            continue
+        used_r.add(ri)
+        used_f.add(fi)
+    return len(used_r)
+
+
+def run_detector(spec, frames):
+    detector = make_detector(spec)
+    detector.detect(frames[0])  # Warm-up: model loading is not part of the per-frame cost
+    boxes, samples = [], []
+    for rgb in frames:
+        started = time.perf_counter()
+        boxes.append(detector.detect(rgb))
+        samples.append(time.perf_counter() - started)
+    return boxes, np.asarray(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='video files, images or directories')
+    parser.add_argument('--detectors', nargs='+', default=['hog', 'haar'], help='detector specs to compare')
+    parser.add_argument('--reference', default='hog:1', help='detector spec treated as ground truth')
+    parser.add_argument('--size', default='320x240', help='detection frame size, WIDTHxHEIGHT')
+    parser.add_argument('--frames', type=int, default=200, help='maximum frames to use')
+    parser.add_argument('--every', type=int, default=1, help='use every Nth video frame')
+    parser.add_argument('--iou', type=float, default=0.4, help='overlap needed to count a reference face as found')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    frames = []
+    for _, _, _, frame in read_frames(args.inputs, max(1, args.every)):
+        frames.append(cv2.cvtColor(cv2.resize(frame, (width, height)), cv2.COLOR_BGR2RGB))
+        if len(frames) >= args.frames:
+            break
+    if not frames:
+        raise SystemExit("❌ No frames could be read from the inputs.")
+
+    reference, _ = run_detector(args.reference, frames)
+    total = sum(len(boxes) for boxes in reference)
+    print(f"{len(frames)} frames at {width}x{height}, {total} faces found by reference '{args.reference}'\n")
+    print(f"{'detector':<28} {'p50 ms':>8} {'p95 ms':>8} {'fps':>8} {'faces':>7} {'recall':>7} {'extra/frame':>12}")
+
+    for spec in args.detectors:
+        try:
+            boxes, samples = run_detector(spec, frames)
+        except Exception as e:
+            print(f"{spec:<28} unavailable: {e}")
+            continue
+        found = sum(len(b) for b in boxes)
+        hits = sum(matched_faces(r, b, args.iou) for r, b in zip(reference, boxes))
+        recall = f"{hits / total:.3f}" if total else '-'
+        extra = (found - hits) / len(frames)
+        print(f"{spec:<28} {np.percentile(samples, 50) * 1000:>8.2f} {np.percentile(samples, 95) * 1000:>8.2f} "
+              f"{1.0 / samples.mean():>8.1f} {found:>7} {recall:>7} {extra:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+Camera sources and fair frame scheduling for multi-entrance setups.
+
+Every CameraSource runs its own capture thread and keeps only its freshest
+frame. Detection workers are shared between all cameras and pull frames
+through FairFrameScheduler, which serves cameras round-robin, so a camera
+that always has a frame ready cannot starve the others of CPU. A camera is
+only served once its DetectionPacer says the next detection is due, and
+with a MotionGate only frames of a changing scene (or with faces still being
+tracked) are offered for detection at all.
+"""
+
+import os
+import threading
+import time
+
+import cv2
+
+from detectors import DEFAULT_DETECTOR
+from metrics import CAPTURE_SECONDS, FRAMES_CAPTURED, FRAMES_GATED
+from pacing import DetectionPacer
+from pipeline import DropOldestQueue, QueueClosed
+from tracker import FaceTracker
+
+RECONNECT_DELAY = 2.0  # seconds between attempts to reopen a lost stream
+
+
+def parse_camera_sources(spec):
+    """
+    Parse CAMERA_SOURCES, e.g. "front=0,gate=rtsp://10.0.0.5/stream,demo=/videos/lecture.mp4".
+
+    Entries without a name are named after their position. Digit-only sources
+    are device indexes; anything else is passed to OpenCV as a URL or file path.
+    """
+    sources = []
+    for position, entry in enumerate(part.strip() for part in (spec or '').split(',')):
+        if not entry:
+            continue
+        name, sep, source = entry.partition('=')
+        if not sep or '://' in name:
+            name, source = str(position), entry
+        source = source.strip()
+        sources.append((name.strip(), int(source) if source.isdigit() else source))
+    return sources
+
+
+def waiting_status():
+    return {'name': '', 'image_url': '', 'status': 'Waiting for recognition...'}
+
+
+class CameraSource:
+    def __init__(self, name, source, fallback=None, detector=DEFAULT_DETECTOR):
+        self.name = name
+        self.source = source
+        self.fallback = fallback  # Device index tried when `source` cannot be opened
+        self.detector = detector  # Face detector spec for this camera, see detectors.py
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+        self.video_capture = None
+        self.frame_lock = threading.Lock()
+        self.frame_cond = threading.Condition(self.frame_lock)  # Notified on every new frame
+        self.current_frame = None
+        self.frame_counter = 0
+        self.frames = DropOldestQueue(maxsize=1)  # Only the freshest frame is worth detecting
+        self.current = waiting_status()
+        self.tracker = FaceTracker()
+        self.pacer = DetectionPacer()
+        self.motion = None
+        self.frames_gated = 0
+        self.on_frame = None
+        self.thread = None
+        self.error = None
+
+    def open(self):
+        """Initialize and start camera capture"""
+        try:
+            self.video_capture = cv2.VideoCapture(self.source)
+            if not self.video_capture.isOpened() and self.fallback is not None:
+                self.video_capture.release()
+                self.video_capture = cv2.VideoCapture(self.fallback)
+
+            if self.video_capture.isOpened():
+                if not isinstance(self.source, str):
+                    # Detection runs on a downscale; the full capture is only used for face crops
+                    self.video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                    self.video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+                    self.video_capture.set(cv2.CAP_PROP_FPS, 15)  # Lower FPS
+                self.video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                self.error = None
+                print(f"✅ Camera '{self.name}' initialized")
+                return True
+
+            self.error = "Camera not accessible"
+            print(f"❌ Camera '{self.name}' not found")
+            return False
+        except Exception as e:
+            self.error = str(e)
+            print(f"❌ Camera '{self.name}' error: {e}")
+            return False
+
+    def start(self, is_active, on_frame=None, pacer=None, motion=None):
+        self.frames = DropOldestQueue(maxsize=1)
+        self.tracker = FaceTracker()
+        self.pacer = pacer or DetectionPacer()
+        self.motion = motion
+        self.frames_gated = 0
+        self.on_frame = on_frame
+        self.thread = threading.Thread(target=self.capture_loop, args=(is_active,), daemon=True)
+        self.thread.start()
+
+    def capture_loop(self, is_active):
+        # Recorded files are replayed at their own frame rate instead of as fast as they decode
+        frame_interval = 0.0
+        if self.is_file:
+            fps = self.video_capture.get(cv2.CAP_PROP_FPS) or 0
+            frame_interval = 1.0 / fps if fps > 0 else 0.0
+        next_frame_at = time.perf_counter()
+        captured, capture_seconds = FRAMES_CAPTURED.labels(self.name), CAPTURE_SECONDS.labels(self.name)
+
+        while is_active():
+            try:
+                started = time.perf_counter()
+                ret, frame = self.video_capture.read()
+                if not ret:
+                    if self.is_file:
+                        print(f"ℹ️ Camera '{self.name}' reached end of file")
+                        break
+                    self.reconnect()
+                    continue
+
+                capture_seconds.observe(time.perf_counter() - started)
+                captured.inc()
+                # read() returns a new array each time, so it can be shared without copying
+                with self.frame_cond:
+                    self.frame_counter += 1
+                    self.current_frame = frame
+                    self.frame_cond.notify_all()
+                if self.offer(frame):
+                    if self.on_frame is not None:
+                        self.on_frame()
+
+                if frame_interval:
+                    next_frame_at += frame_interval
+                    delay = next_frame_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+            except Exception as e:
+                print(f"⚠️ Capture error on '{self.name}': {e}")
+        self.frames.close()
+        if self.on_frame is not None:
+            self.on_frame()
+
+    def offer(self, frame):
+        """Queue a frame for detection unless the motion gate finds nothing worth detecting"""
+        roi = None
+        if self.motion is not None:
+            now = time.monotonic()
+            moving, started, roi = self.motion.update(frame, now)
+            if started:
+                self.pacer.wake(now)
+            # A still scene is skipped unless someone in it is still being tracked
+            if not moving and not self.tracker.active(time.time()):
+                self.frames_gated += 1
+                FRAMES_GATED.labels(self.name).inc()
+                return False
+        self.frames.put((self.frame_counter, frame, roi))
+        return True
+
+    def reconnect(self):
+        time.sleep(RECONNECT_DELAY if isinstance(self.source, str) else 0.01)
+        if isinstance(self.source, str) and not self.video_capture.isOpened():
+            self.video_capture.release()
+            self.open()
+
+    def stop(self):
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+        if self.video_capture:
+            self.video_capture.release()
+            self.video_capture = None
+
+    def wait_frame(self, after, timeout=None):
+        """Block until a frame newer than version `after` exists; returns (frame, version) or (None, after)"""
+        with self.frame_cond:
+            if not self.frame_cond.wait_for(lambda: self.frame_counter != after, timeout):
+                return None, after
+            # Frames are never modified after capture, so no copy is needed
+            return self.current_frame, self.frame_counter
+
+    def stats(self):
+        return {
+            'source': str(self.source),
+            'detector': self.detector,
+            'open': self.video_capture is not None and self.video_capture.isOpened(),
+            'error': self.error,
+            'frames_captured': self.frame_counter,
+            'frame_queue': self.frames.stats(),
+            'tracker': self.tracker.stats(),
+            'pacing': self.pacer.stats(),
+            'frames_gated': self.frames_gated,
+            'motion': self.motion.stats() if self.motion is not None else None,
+        }
+
+
+class FairFrameScheduler:
+    def __init__(self, cameras):
+        self.cameras = list(cameras)
+        self.cond = threading.Condition()
+        self.next_index = 0
+        self.served = {camera.name: 0 for camera in self.cameras}
+
+    def notify(self):
+        """Called by a camera after it published a new frame"""
+        with self.cond:
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Return (camera, (frame_id, frame, roi)) from the next camera in round-robin
+        order that is due for detection and has a fresh frame; None on
+        timeout, QueueClosed once every camera has stopped.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                open_cameras = 0
+                next_due = None
+                now = time.monotonic()
+                count = len(self.cameras)
+                for offset in range(count):
+                    position = (self.next_index + offset) % count
+                    camera = self.cameras[position]
+                    if camera.frames.closed and not len(camera.frames):
+                        continue
+                    open_cameras += 1
+                    if not camera.pacer.due(now):
+                        # Leave its frame queued; newer captures keep replacing it until it is due
+                        wait = camera.pacer.wait_time(now)
+                        next_due = wait if next_due is None else min(next_due, wait)
+                        continue
+                    try:
+                        item = camera.frames.get(timeout=0)
+                    except QueueClosed:
+                        continue
+                    if item is not None:
+                        self.next_index = (position + 1) % count
+                        self.served[camera.name] += 1
+                        camera.pacer.claim(now)
+                        return camera, item
+                if open_cameras == 0:
+                    raise QueueClosed()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                if next_due is not None:
+                    remaining = next_due if remaining is None else min(remaining, next_due)
+                self.cond.wait(remaining)
+
+    def close(self):
+        with self.cond:
+            self.cond.notify_all()
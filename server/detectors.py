@@ -0,0 +1,117 @@
+"""
+Pluggable face detectors.
+
+Every backend takes an RGB uint8 image and returns face boxes as
+(top, right, bottom, left) tuples, the format face_recognition uses, so
+encodings and the tracker do not care which detector found a face.
+Detectors are named by a short spec string:
+
+- "hog", "hog:1"       dlib HOG (optionally upsampled; the default)
+- "cnn"                dlib CNN (GPU builds only)
+- "haar", "haar:<xml>" OpenCV Haar cascade, the frontal-face model shipped with OpenCV by default
+- "yunet:<onnx>"       OpenCV FaceDetectorYN with a locally supplied YuNet model file
+
+get_detector() caches one instance per spec and thread, because OpenCV
+detectors keep per-call state and are not safe to share between threads.
+"""
+
+import os
+import threading
+
+import cv2
+
+DEFAULT_DETECTOR = 'hog'
+
+
+class DlibDetector:
+    def __init__(self, model='hog', upsample=0):
+        import face_recognition
+        self.face_recognition = face_recognition
+        self.model = model
+        self.upsample = upsample
+
+    def detect(self, rgb):
+        return self.face_recognition.face_locations(rgb, model=self.model, number_of_times_to_upsample=self.upsample)
+
+
+class HaarDetector:
+    def __init__(self, cascade=None, scale_factor=1.1, min_neighbors=5, min_size=(20, 20)):
+        if not hasattr(cv2, 'CascadeClassifier'):
+            raise ValueError("this OpenCV build has no Haar cascade support (OpenCV 5 moved it out of the main module)")
+        cascade = cascade or os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        self.classifier = cv2.CascadeClassifier(cascade)
+        if self.classifier.empty():
+            raise ValueError(f"could not load Haar cascade {cascade}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size  # Smallest face in pixels of the detection frame
+
+    def detect(self, rgb):
+        gray = cv2.equalizeHist(cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY))
+        faces = self.classifier.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=self.min_size)
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in faces]
+
+
+class YuNetDetector:
+    def __init__(self, model_path, score_threshold=0.8, nms_threshold=0.3, top_k=50):
+        if not model_path or not os.path.isfile(model_path):
+            raise ValueError(f"YuNet model file not found: {model_path!r}")
+        self.net = cv2.FaceDetectorYN.create(model_path, '', (320, 240), score_threshold, nms_threshold, top_k)
+        self.input_size = (320, 240)
+
+    def detect(self, rgb):
+        height, width = rgb.shape[:2]
+        if (width, height) != self.input_size:
+            self.net.setInputSize((width, height))
+            self.input_size = (width, height)
+        _, faces = self.net.detect(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        boxes = []
+        for face in faces if faces is not None else ():
+            x, y, w, h = face[:4]
+            left, top = max(0, int(x)), max(0, int(y))
+            right, bottom = min(width, int(x + w)), min(height, int(y + h))
+            if right > left and bottom > top:
+                boxes.append((top, right, bottom, left))
+        return boxes
+
+
+def make_detector(spec):
+    """Build a detector from a spec like "hog", "haar" or "yunet:/models/face_detection_yunet.onnx" """
+    name, _, arg = (spec or DEFAULT_DETECTOR).strip().partition(':')
+    name = name.lower()
+    if name in ('hog', 'cnn'):
+        return DlibDetector(name, upsample=int(arg or 0))
+    if name == 'haar':
+        return HaarDetector(arg or None)
+    if name == 'yunet':
+        return YuNetDetector(arg)
+    raise ValueError(f"unknown face detector {spec!r}")
+
+
+_local = threading.local()
+
+
+def get_detector(spec):
+    """This thread's cached detector for a spec"""
+    cache = getattr(_local, 'detectors', None)
+    if cache is None:
+        cache = _local.detectors = {}
+    detector = cache.get(spec)
+    if detector is None:
+        detector = cache[spec] = make_detector(spec)
+    return detector
+
+
+def detect_faces(rgb, spec=DEFAULT_DETECTOR):
+    return get_detector(spec).detect(rgb)
+
+
+def parse_camera_detectors(spec):
+    """Parse CAMERA_DETECTORS, e.g. "front=haar,gate=yunet:/models/face_detection_yunet.onnx" """
+    detectors = {}
+    for entry in (spec or '').split(','):
+        name, sep, detector = entry.strip().partition('=')
+        if sep and name.strip() and detector.strip():
+            detectors[name.strip()] = detector.strip()
+    return detectors
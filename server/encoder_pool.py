@@ -0,0 +1,181 @@
+"""
+Process pool for dlib face detection and encoding.
+
+dlib's HOG detector and ResNet encoder hold the GIL, so threads cannot use
+more than one core. FaceWorkerPool runs them in dedicated worker processes
+instead. Each worker:
+
+- is started once and warms up (loads the dlib models, runs one detection)
+  before taking work, so the first frame is not slow;
+- owns a shared-memory frame buffer, so a frame is handed over with one
+  memcpy instead of being pickled through a pipe;
+- reports how long every task kept it busy, which /health turns into a
+  per-worker utilisation figure.
+
+Callers own one worker each (worker index == detect thread index) and call
+detect() / encode_image() synchronously; waiting on the pipe releases the
+GIL. detect() takes the downscaled detection frame; encode_image() takes the
+canvas of full-resolution face crops, so only faces that need encoding
+(e.g. not already tracked ones) are copied to the worker.
+"""
+
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from batch_encoder import encode_faces
+from detectors import DEFAULT_DETECTOR, detect_faces
+
+UTILISATION_WINDOW = 10.0  # seconds
+
+
+def _worker_main(conn, detector, num_jitters):
+    # Warm-up: loading the models and running detection once keeps that cost off the first frame
+    encode_faces(np.zeros((96, 96, 3), dtype=np.uint8), [(8, 88, 88, 8)])
+    detect_faces(np.zeros((120, 160, 3), dtype=np.uint8), detector)
+    conn.send(('ready', os.getpid()))
+
+    shm = None
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        op, name, shape, arg = task
+        started = time.perf_counter()
+        try:
+            if shm is None or shm.name != name:
+                if shm is not None:
+                    shm.close()
+                # Forked workers share the parent's resource tracker, which owns the segment
+                shm = shared_memory.SharedMemory(name=name)
+            image = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+            if op == 'detect':
+                # arg is the detector spec; each camera may use a different backend
+                result = detect_faces(image, arg)
+            else:
+                # All faces of the image go through the descriptor network in one batch
+                result = encode_faces(image, arg, num_jitters) if arg else []
+            conn.send(('ok', result, time.perf_counter() - started))
+        except Exception as e:
+            conn.send(('error', str(e), time.perf_counter() - started))
+    if shm is not None:
+        shm.close()
+
+
+class _Worker:
+    def __init__(self, ctx, detector, num_jitters):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, detector, num_jitters), daemon=True)
+        self.process.start()
+        child.close()
+        self.pid = None
+        self.shm = None
+        self.shape = None
+        self.lock = threading.Lock()
+        self.tasks = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.recent = deque()  # (finished_at, busy seconds) within the utilisation window
+
+    def wait_ready(self, timeout):
+        if not self.conn.poll(timeout):
+            raise TimeoutError("face worker did not start in time")
+        _, self.pid = self.conn.recv()
+
+    def buffer_for(self, nbytes):
+        if self.shm is None or self.shm.size < nbytes:
+            if self.shm is not None:
+                self.shm.close()
+                self.shm.unlink()
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        return self.shm
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class FaceWorkerPool:
+    def __init__(self, workers, detector=DEFAULT_DETECTOR, num_jitters=0, start_timeout=120):
+        # fork: workers start from the already imported dlib/numpy modules and, unlike
+        # spawn, do not re-run app.py's module-level setup in every child
+        ctx = mp.get_context('fork')
+        # Start the tracker before forking so workers share it instead of each starting
+        # their own, which would report the parent's segments as leaked at exit
+        resource_tracker.ensure_running()
+        self.workers = [_Worker(ctx, detector, num_jitters) for _ in range(workers)]
+        for worker in self.workers:
+            worker.wait_ready(start_timeout)
+        self.started_at = time.time()
+
+    def __len__(self):
+        return len(self.workers)
+
+    def call(self, worker, task):
+        worker.conn.send(task)
+        status, result, busy = worker.conn.recv()
+        now = time.time()
+        worker.tasks += 1
+        worker.busy_s += busy
+        worker.recent.append((now, busy))
+        while worker.recent and worker.recent[0][0] < now - UTILISATION_WINDOW:
+            worker.recent.popleft()
+        if status != 'ok':
+            worker.errors += 1
+            raise RuntimeError(result)
+        return result
+
+    def upload(self, worker, rgb):
+        # Called with worker.lock held
+        rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+        shm = worker.buffer_for(rgb.nbytes)
+        np.ndarray(rgb.shape, dtype=np.uint8, buffer=shm.buf)[...] = rgb
+        worker.shape = rgb.shape
+        return shm
+
+    def detect(self, index, rgb, detector=DEFAULT_DETECTOR):
+        """Copy an RGB uint8 frame into worker `index`'s buffer and return its face locations"""
+        worker = self.workers[index % len(self.workers)]
+        with worker.lock:
+            shm = self.upload(worker, rgb)
+            return self.call(worker, ('detect', shm.name, worker.shape, detector))
+
+    def encode_image(self, index, rgb, locs):
+        """Copy an RGB uint8 image into worker `index`'s buffer and encode the faces at `locs`"""
+        worker = self.workers[index % len(self.workers)]
+        with worker.lock:
+            shm = self.upload(worker, rgb)
+            return self.call(worker, ('encode', shm.name, worker.shape, list(locs)))
+
+    def stats(self):
+        now = time.time()
+        window = min(UTILISATION_WINDOW, max(now - self.started_at, 1e-6))
+        return [{
+            'pid': worker.pid,
+            'alive': worker.process.is_alive(),
+            'tasks': worker.tasks,
+            'errors': worker.errors,
+            'busy_s': round(worker.busy_s, 3),
+            'utilisation': round(min(1.0, sum(b for t, b in list(worker.recent) if t >= now - window) / window), 3),
+        } for worker in self.workers]
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
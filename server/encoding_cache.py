@@ -0,0 +1,119 @@
+"""
+On-disk cache of student face encodings.
+
+Entries are keyed by student id + image URL and remember the SHA-256 of the
+photo they were computed from, so unchanged students can be loaded without
+touching the network or dlib, and a re-uploaded copy of the same photo does
+not need to be encoded again.
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+ENCODING_SIZE = 128
+
+
+def content_hash(data):
+    """Return the hex SHA-256 of raw photo bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class EncodingCache:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        # student_id -> (image_url, content_hash, encoding or None when no face was found)
+        self.entries = {}
+        self.by_hash = {}
+        self.dirty = False
+
+    def load(self):
+        """Read the cache file from disk, ignoring a missing or corrupt file"""
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                ids = data['ids']
+                urls = data['urls']
+                hashes = data['hashes']
+                encodings = data['encodings']
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable encoding cache {self.path}: {e}")
+            return 0
+
+        with self.lock:
+            self.entries.clear()
+            self.by_hash.clear()
+            for sid, url, digest, enc in zip(ids, urls, hashes, encodings):
+                enc = None if np.isnan(enc).any() else enc.astype(np.float64)
+                self.entries[str(sid)] = (str(url), str(digest), enc)
+                self.by_hash[str(digest)] = enc
+            self.dirty = False
+        return len(self.entries)
+
+    def lookup(self, student_id, image_url):
+        """Return (hit, encoding) for a student whose photo URL is unchanged"""
+        with self.lock:
+            entry = self.entries.get(str(student_id))
+        if entry is None or entry[0] != image_url:
+            return False, None
+        return True, entry[2]
+
+    def lookup_hash(self, digest):
+        """Return (hit, encoding) for photo bytes that were already encoded"""
+        with self.lock:
+            if digest not in self.by_hash:
+                return False, None
+            return True, self.by_hash[digest]
+
+    def put(self, student_id, image_url, digest, encoding):
+        with self.lock:
+            self.entries[str(student_id)] = (image_url, digest, encoding)
+            self.by_hash[digest] = encoding
+            self.dirty = True
+
+    def prune(self, keep_ids):
+        """Drop entries for students that no longer exist"""
+        keep_ids = {str(sid) for sid in keep_ids}
+        with self.lock:
+            stale = [sid for sid in self.entries if sid not in keep_ids]
+            for sid in stale:
+                del self.entries[sid]
+            if stale:
+                live = {entry[1] for entry in self.entries.values()}
+                self.by_hash = {h: e for h, e in self.by_hash.items() if h in live}
+                self.dirty = True
+        return len(stale)
+
+    def save(self):
+        """Atomically write the cache to disk if it changed"""
+        with self.lock:
+            if not self.dirty:
+                return False
+            items = list(self.entries.items())
+            self.dirty = False
+
+        encodings = np.full((len(items), ENCODING_SIZE), np.nan, dtype=np.float64)
+        for i, (_, (_, _, enc)) in enumerate(items):
+            if enc is not None:
+                encodings[i] = enc
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                ids=np.array([sid for sid, _ in items], dtype=str),
+                urls=np.array([entry[0] for _, entry in items], dtype=str),
+                hashes=np.array([entry[1] for _, entry in items], dtype=str),
+                encodings=encodings,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        return True
@@ -0,0 +1,61 @@
+"""
+In-process event bus for recognition and attendance events.
+
+Events get increasing sequence numbers and are kept in a bounded ring buffer,
+so Server-Sent Events and long-poll clients can resume from the last
+sequence number they saw. A client that fell further behind than the buffer
+holds is told so (``missed``) and should refresh from /current.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+
+class EventBus:
+    def __init__(self, capacity=1000):
+        self.events = deque(maxlen=capacity)
+        self.cond = threading.Condition()
+        self.seq = 0
+
+    def publish(self, kind, data):
+        with self.cond:
+            self.seq += 1
+            self.events.append({'seq': self.seq, 'type': kind, 'time': time.time(), 'data': data})
+            self.cond.notify_all()
+            return self.seq
+
+    def since(self, after):
+        # Called with self.cond held
+        if not self.events or after >= self.seq:
+            return [], False
+        oldest = self.events[0]['seq']
+        missed = after < oldest - 1
+        return [event for event in self.events if event['seq'] > after], missed
+
+    def wait(self, after, timeout):
+        """Block until events newer than `after` exist or timeout; returns (events, missed, latest seq)"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > after, timeout)
+            events, missed = self.since(after)
+            return events, missed, self.seq
+
+    def latest(self):
+        with self.cond:
+            return self.seq
+
+    def stream(self, after, heartbeat=15.0):
+        """Generator of Server-Sent Events frames starting after sequence `after`"""
+        yield 'retry: 3000\n\n'
+        while True:
+            events, missed, latest = self.wait(after, heartbeat)
+            if missed:
+                yield f'event: missed\ndata: {json.dumps({"seq": latest})}\n\n'
+            if not events:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+                continue
+            for event in events:
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            after = events[-1]['seq']
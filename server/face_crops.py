@@ -0,0 +1,46 @@
+"""
+Full-resolution face crops for encoding.
+
+Detection runs on a small downscale, but landmarks and encodings are much
+steadier on the original pixels. crop_canvas() cuts a padded crop around
+every face box of the full-resolution BGR frame and lays the crops side by
+side on one RGB canvas, so all faces are encoded in a single
+face_encodings() call (and a single shared-memory copy in worker mode)
+without converting the whole frame. crop_canvas_many() does the same for
+the faces of several frames at once, so batch mode can encode them together.
+"""
+
+import cv2
+import numpy as np
+
+
+def crop_canvas(frame, boxes, margin=0.3):
+    """
+    Pack padded crops of (top, right, bottom, left) boxes of a BGR frame onto one RGB canvas.
+
+    Returns (canvas, local_boxes) with each box translated into canvas coordinates.
+    """
+    return crop_canvas_many([(frame, boxes)], margin)
+
+
+def crop_canvas_many(frames, margin=0.3):
+    """crop_canvas for a list of (BGR frame, boxes); local boxes come back in the same frame/box order"""
+    crops, local_boxes = [], []
+    x = 0
+    for frame, boxes in frames:
+        height, width = frame.shape[:2]
+        for top, right, bottom, left in boxes:
+            top, right, bottom, left = max(0, top), min(width, right), min(height, bottom), max(0, left)
+            pad = int(margin * max(right - left, bottom - top))
+            y0, y1 = max(0, top - pad), min(height, bottom + pad)
+            x0, x1 = max(0, left - pad), min(width, right + pad)
+            crops.append(frame[y0:y1, x0:x1])
+            local_boxes.append((top - y0, x + right - x0, bottom - y0, x + left - x0))
+            x += x1 - x0
+
+    canvas = np.zeros((max((crop.shape[0] for crop in crops), default=0), x, 3), dtype=np.uint8)
+    x = 0
+    for crop in crops:
+        canvas[:crop.shape[0], x:x + crop.shape[1]] = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        x += crop.shape[1]
+    return canvas, local_boxes
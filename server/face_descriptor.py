@@ -0,0 +1,62 @@
+"""
+Serialization for the students.face_descriptor column.
+
+A descriptor is stored as text in the form ``f32:<photo tag>:<base64>`` where
+the payload is the 128-d encoding as little-endian float32 (684 characters
+instead of ~2.5 KB of JSON floats), or several of them back to back when the
+student has more than one template; the photo's own encoding comes first.
+The photo tag is a short hash of the
+image_url the encoding was computed from, so a descriptor left over from a
+replaced photo is detected as stale. Photos in which no face was found are
+recorded as ``none:<photo tag>`` so they are not re-encoded on every load.
+"""
+
+import base64
+import hashlib
+
+import numpy as np
+
+ENCODING_SIZE = 128
+
+
+def photo_tag(image_url):
+    return hashlib.sha1((image_url or '').encode('utf-8')).hexdigest()[:12]
+
+
+def serialize_descriptor(encoding, image_url):
+    """Encode a face encoding, a (templates x 128) array or None for 'no face' for the face_descriptor column"""
+    tag = photo_tag(image_url)
+    if encoding is None:
+        return f"none:{tag}"
+    payload = np.asarray(encoding, dtype='<f4').tobytes()
+    return f"f32:{tag}:{base64.b64encode(payload).decode('ascii')}"
+
+
+def parse_descriptor(text, image_url):
+    """
+    Decode a face_descriptor value for a student's current image_url.
+
+    Returns (fresh, encoding). fresh is False when the descriptor is missing,
+    unreadable or was computed from a different photo and needs a backfill;
+    encoding is None when the photo is known to contain no face, and a
+    (templates x 128) array when more than one template is stored.
+    """
+    if not text:
+        return False, None
+    try:
+        kind, rest = text.split(':', 1)
+        if kind == 'none':
+            return rest == photo_tag(image_url), None
+        if kind != 'f32':
+            return False, None
+        tag, payload = rest.split(':', 1)
+        if tag != photo_tag(image_url):
+            return False, None
+        encoding = np.frombuffer(base64.b64decode(payload), dtype='<f4')
+        if encoding.size == 0 or encoding.size % ENCODING_SIZE or not np.isfinite(encoding).all():
+            return False, None
+        if encoding.size > ENCODING_SIZE:
+            encoding = encoding.reshape(-1, ENCODING_SIZE)
+        return True, encoding.astype(np.float64)
+    except (ValueError, TypeError):
+        return False, None
@@ -0,0 +1,208 @@
+"""
+Concurrent gallery loading for FaceRecognitionSystem.load_faces.
+
+Photos are fetched over a pooled keep-alive HTTP session on an I/O thread
+pool and handed straight to a process pool for the CPU-bound dlib detection
+and encoding, so downloads and encodes overlap and every core is used.
+Photos that arrive while every encode worker is busy are grouped, and each
+group goes through the descriptor network in one batched call. The number
+of students in flight is bounded to keep memory flat on large rosters.
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from batch_encoder import encode_images
+from detectors import DEFAULT_DETECTOR, detect_faces
+from encoding_cache import content_hash
+
+
+def make_session(pool_size):
+    """Create an HTTP session that keeps up to pool_size connections alive per host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def download_photo(session, url, timeout=(3.05, 10)):
+    """Fetch photo bytes; returns (bytes, seconds)"""
+    started = time.perf_counter()
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content, time.perf_counter() - started
+
+
+def decode_photo(image):
+    """Decode photo bytes into the half-size RGB image encodings are computed on"""
+    nparr = np.frombuffer(image, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("photo could not be decoded")
+    rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    # Resize image for faster processing
+    return cv2.resize(rgb_img, (0, 0), fx=0.5, fy=0.5)
+
+
+def encode_photos(images, detector=DEFAULT_DETECTOR):
+    """
+    Encode several registration photos with one batched descriptor pass.
+
+    Returns one entry per photo: its encoding, None if no face is found, or
+    the exception that photo raised, so one bad photo does not fail the rest.
+    """
+    results = [None] * len(images)
+
+    def faces():
+        for i, image in enumerate(images):
+            try:
+                rgb_img = decode_photo(image)
+                locs = detect_faces(rgb_img, detector)
+            except Exception as e:
+                results[i] = e
+                continue
+            # Only the first face counts, as with face_encodings(...)[0]
+            yield i, rgb_img, locs[:1]
+
+    for i, encs in encode_images(faces()):
+        results[i] = encs[0] if encs else None
+    return results
+
+
+def _timed_encode(images, detector):
+    started = time.perf_counter()
+    results = encode_photos(images, detector)
+    return results, time.perf_counter() - started
+
+
+def new_report(total):
+    return {
+        'students': total,
+        'cache_hits': 0,
+        'downloaded': 0,
+        'encoded': 0,
+        'no_face': 0,
+        'loaded': 0,
+        'failures': [],
+        'timings': {'download_s': 0.0, 'encode_s': 0.0, 'wall_s': 0.0},
+    }
+
+
+def load_student_encodings(students, cache, detector=DEFAULT_DETECTOR, download_workers=16,
+                           encode_workers=None, max_in_flight=64, encode_batch=16):
+    """
+    Resolve an encoding for every student row.
+
+    Returns (loaded, report) where loaded is a list of (student, encoding) in
+    roster order and report holds counters, per-stage timings and per-student
+    failures. Downloaded photos are sent to an idle encode worker right away,
+    or grouped up to `encode_batch` photos while all workers are busy.
+    """
+    started = time.perf_counter()
+    report = new_report(len(students))
+    loaded = {}
+    pending = []
+
+    for index, student in enumerate(students):
+        hit, enc = cache.lookup(student['id'], student['image_url'])
+        if hit:
+            report['cache_hits'] += 1
+            if enc is not None:
+                loaded[index] = (student, enc)
+            else:
+                report['no_face'] += 1
+        else:
+            pending.append((index, student))
+
+    def fail(student, stage, error):
+        report['failures'].append({
+            'id': student['id'],
+            'name': student.get('name'),
+            'stage': stage,
+            'error': str(error),
+        })
+
+    def store(index, student, digest, enc):
+        cache.put(student['id'], student['image_url'], digest, enc)
+        if enc is not None:
+            loaded[index] = (student, enc)
+        else:
+            report['no_face'] += 1
+
+    if pending:
+        encode_workers = encode_workers or os.cpu_count() or 1
+        session = make_session(download_workers)
+        queue = iter(pending)
+        downloads = {}
+        encodes = {}
+        ready = []  # Downloaded photos waiting for an encode worker: (image, index, student, digest)
+        exhausted = False
+
+        with ThreadPoolExecutor(max_workers=download_workers) as io_pool, \
+                ProcessPoolExecutor(max_workers=encode_workers) as cpu_pool:
+            while True:
+                # Top up downloads while the pipeline has room
+                in_flight = len(downloads) + len(ready) + sum(len(batch) for batch in encodes.values())
+                while not exhausted and in_flight < max_in_flight:
+                    item = next(queue, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    future = io_pool.submit(download_photo, session, item[1]['image_url'])
+                    downloads[future] = item
+                    in_flight += 1
+
+                if not downloads and not encodes:
+                    break
+
+                done, _ = wait(list(downloads) + list(encodes), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in downloads:
+                        index, student = downloads.pop(future)
+                        try:
+                            image, elapsed = future.result()
+                        except Exception as e:
+                            fail(student, 'download', e)
+                            continue
+                        report['downloaded'] += 1
+                        report['timings']['download_s'] += elapsed
+                        digest = content_hash(image)
+                        hit, enc = cache.lookup_hash(digest)
+                        if hit:
+                            store(index, student, digest, enc)
+                        else:
+                            ready.append((image, index, student, digest))
+                    else:
+                        batch = encodes.pop(future)
+                        try:
+                            results, elapsed = future.result()
+                        except Exception as e:
+                            results, elapsed = [e] * len(batch), 0.0
+                        report['timings']['encode_s'] += elapsed
+                        for (index, student, digest), enc in zip(batch, results):
+                            if isinstance(enc, Exception):
+                                fail(student, 'encode', enc)
+                                continue
+                            report['encoded'] += 1
+                            store(index, student, digest, enc)
+
+                # Submit waiting photos when a worker is idle, a batch is full or no more downloads will come
+                while ready and (len(encodes) < encode_workers or len(ready) >= encode_batch or not downloads):
+                    group, ready = ready[:encode_batch], ready[encode_batch:]
+                    future = cpu_pool.submit(_timed_encode, [image for image, *_ in group], detector)
+                    encodes[future] = [item for _, *item in group]
+
+        session.close()
+
+    report['loaded'] = len(loaded)
+    report['timings']['wall_s'] = time.perf_counter() - started
+    for key, value in report['timings'].items():
+        report['timings'][key] = round(value, 3)
+    return [loaded[i] for i in sorted(loaded)], report
@@ -0,0 +1,67 @@
+"""
+Multiple face templates per student.
+
+A single registration photo gives a poor match margin when the student
+looks different live (lighting, glasses, pose), so confident live matches
+are kept as extra templates. TemplateLearner collects them from the match
+loop; compact_templates() caps how many a student keeps by repeatedly
+dropping the template closest to another one, so the survivors stay
+diverse and gallery scans stay bounded. The photo's own template comes
+first and is never dropped.
+"""
+
+import threading
+
+import numpy as np
+
+ENCODING_SIZE = 128
+
+
+def compact_templates(templates, cap, pinned=1):
+    """Drop the most redundant templates until at most `cap` remain; the first `pinned` are kept"""
+    templates = np.asarray(templates, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+    if len(templates) <= cap:
+        return templates
+    diff = templates[:, None, :] - templates[None, :, :]
+    dist = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+    np.fill_diagonal(dist, np.inf)
+    keep = np.arange(len(templates))
+    while len(keep) > cap:
+        nearest = dist[np.ix_(keep, keep)].min(axis=1)
+        nearest[:pinned] = np.inf
+        keep = np.delete(keep, np.argmin(nearest))
+    return templates[keep]
+
+
+class TemplateLearner:
+    def __init__(self, learn_distance=0.45, learn_margin=0.15, min_novelty=0.2, interval=60.0):
+        self.learn_distance = learn_distance  # Only matches this close (well inside the tolerance) are learned
+        self.learn_margin = learn_margin  # ... and this much closer than the next student
+        self.min_novelty = min_novelty  # Closer than this to the student's templates adds nothing new
+        self.interval = interval  # Seconds between templates learned for one student
+        self.lock = threading.Lock()
+        self.pending = {}  # student id -> [encodings]
+        self.last_learned = {}
+        self.learned = 0
+
+    def offer(self, student_id, encoding, distance, margin, now):
+        """Keep a live encoding as a template candidate if the match was confident; returns True if kept"""
+        if not (self.min_novelty <= distance < self.learn_distance and margin >= self.learn_margin):
+            return False
+        with self.lock:
+            if now - self.last_learned.get(student_id, float('-inf')) < self.interval:
+                return False
+            self.last_learned[student_id] = now
+            self.pending.setdefault(student_id, []).append(np.asarray(encoding, dtype=np.float32))
+            self.learned += 1
+        return True
+
+    def drain(self):
+        """Return and clear the collected candidates as {student id: [encodings]}"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        return pending
+
+    def stats(self):
+        with self.lock:
+            return {'learned': self.learned, 'pending': sum(len(encs) for encs in self.pending.values())}
@@ -0,0 +1,279 @@
+"""
+In-memory face gallery.
+
+All known encodings live in one preallocated, contiguous float32 matrix with
+parallel id / name / image_url arrays, so a frame's faces are matched
+against the whole roster in a single matrix product instead of a Python loop
+over per-student arrays. Large rosters can additionally be served from an
+IVF index (ann_index.py) or a compact int8/float16 copy (quantize.py); in
+both cases the shortlist they return is reranked exactly in float32.
+
+A student may own several consecutive rows (templates). Row distances are
+then reduced per student (minimum or mean over the student's templates)
+with one reduceat over the row segments, so results, margins and the
+tolerance check are per student, never between two templates of one person.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from ann_index import IVFIndex
+from quantize import QuantizedMatrix
+
+ENCODING_SIZE = 128
+
+# indices / distances are (faces, k) arrays sorted by distance; margins is
+# (faces,) second-best minus best distance (inf when only one candidate exists)
+MatchResult = namedtuple('MatchResult', ['indices', 'distances', 'margins'])
+
+
+def _empty_result(faces, k):
+    return MatchResult(
+        np.full((faces, k), -1, dtype=np.int64),
+        np.full((faces, k), np.inf, dtype=np.float32),
+        np.full(faces, np.inf, dtype=np.float32),
+    )
+
+
+REDUCTIONS = ('min', 'mean')
+
+
+class FaceGallery:
+    def __init__(self, capacity=0, reduction='min'):
+        if reduction not in REDUCTIONS:
+            raise ValueError(f"unknown template reduction {reduction!r}, expected one of {REDUCTIONS}")
+        capacity = max(int(capacity), 1)
+        self.encodings = np.zeros((capacity, ENCODING_SIZE), dtype=np.float32)
+        self.sq_norms = np.zeros(capacity, dtype=np.float32)
+        self.owners = np.zeros(capacity, dtype=np.int64)  # Student number of every row, non-decreasing
+        self.ids = np.empty(capacity, dtype=object)
+        self.names = np.empty(capacity, dtype=object)
+        self.image_urls = np.empty(capacity, dtype=object)
+        self.size = 0
+        self.student_count = 0
+        self.reduction = reduction  # How a student's template distances combine: 'min' or 'mean'
+        self.index = None
+        self.quantized = None
+        self.shortlist = 16  # Quantized candidates per face that get an exact rerank
+        self._segments = None
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self, capacity):
+        size = self.size
+        encodings = np.zeros((capacity, ENCODING_SIZE), dtype=np.float32)
+        encodings[:size] = self.encodings[:size]
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        sq_norms[:size] = self.sq_norms[:size]
+        owners = np.zeros(capacity, dtype=np.int64)
+        owners[:size] = self.owners[:size]
+        self.owners = owners
+        arrays = []
+        for old in (self.ids, self.names, self.image_urls):
+            new = np.empty(capacity, dtype=object)
+            new[:size] = old[:size]
+            arrays.append(new)
+        self.encodings, self.sq_norms = encodings, sq_norms
+        self.ids, self.names, self.image_urls = arrays
+
+    def add(self, student_id, name, image_url, encoding):
+        """Append one student with a single encoding or a (templates x 128) array; returns its first row"""
+        rows = np.asarray(encoding, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        index, end = self.size, self.size + len(rows)
+        if end > len(self.encodings):
+            self._grow(max(2 * len(self.encodings), end))
+        self.encodings[index:end] = rows
+        self.sq_norms[index:end] = np.einsum('ij,ij->i', rows, rows)
+        self.owners[index:end] = self.student_count
+        self.ids[index:end] = student_id
+        self.names[index:end] = name
+        self.image_urls[index:end] = image_url
+        self.student_count += 1
+        # Publish the rows only once they are fully written
+        self.size = end
+        return index
+
+    def segments(self):
+        """Row offsets per student: student s owns rows segments[s]:segments[s + 1]"""
+        segments = self._segments
+        if segments is None or segments[-1] != self.size:
+            n = self.size
+            starts = np.flatnonzero(np.diff(self.owners[:n], prepend=-1))
+            segments = self._segments = np.append(starts, n)
+        return segments
+
+    def templates(self, student_id):
+        """Return (encodings, name, image_url) of a student's templates, or None if it is not in the gallery"""
+        n = self.size
+        rows = np.flatnonzero(np.fromiter((str(sid) == str(student_id) for sid in self.ids[:n]), dtype=bool, count=n))
+        if len(rows) == 0:
+            return None
+        return self.encodings[rows].copy(), self.names[rows[0]], self.image_urls[rows[0]]
+
+    def build_index(self, min_size=5000, nprobe=8, nlist=None, retrain_growth=0.2):
+        """
+        Build or update an IVF index over the current rows; galleries below min_size keep exact search.
+
+        An index carried over by with_changes keeps its centroids, and only
+        the rows added since are assigned, until the gallery size has moved
+        by more than retrain_growth (a fraction) from the size the centroids
+        were trained on.
+        """
+        if self.size < min_size:
+            self.index = None
+            return None
+        index = self.index
+        if (index is not None and index.nlist == nlist
+                and index.trained_size / (1 + retrain_growth) <= self.size <= index.trained_size * (1 + retrain_growth)):
+            index = index.extend(self.encodings[:self.size])
+        else:
+            index = IVFIndex(nlist=nlist).build(self.encodings[:self.size])
+        index.nprobe = nprobe
+        self.index = index
+        return index
+
+    def quantize(self, kind='int8', min_size=1000, shortlist=16):
+        """Build a compact int8/float16 copy for shortlisting; None or galleries below min_size keep the float32 scan"""
+        if kind is None or self.size < max(min_size, shortlist + 1):
+            self.quantized = None
+            return None
+        self.shortlist = shortlist
+        self.quantized = QuantizedMatrix(kind).build(self.encodings[:self.size])
+        return self.quantized
+
+    def with_changes(self, upserts, removed_ids=()):
+        """
+        Return a new gallery with rows replaced, added or removed (copy-on-write).
+
+        upserts is a list of (student_id, name, image_url, encoding); an
+        encoding of None just drops the student. The receiver is not modified,
+        so readers holding it keep a consistent view until the new gallery
+        is swapped in.
+        """
+        replaced = {str(sid) for sid, _, _, _ in upserts} | {str(sid) for sid in removed_ids}
+        n = self.size
+        keep = np.fromiter((str(sid) not in replaced for sid in self.ids[:n]), dtype=bool, count=n)
+        additions = [row for row in upserts if row[3] is not None]
+        added = sum(np.asarray(row[3]).size // ENCODING_SIZE for row in additions)
+
+        kept = int(keep.sum())
+        gallery = FaceGallery(capacity=kept + added, reduction=self.reduction)
+        gallery.encodings[:kept] = self.encodings[:n][keep]
+        gallery.sq_norms[:kept] = self.sq_norms[:n][keep]
+        # Renumber the surviving students densely; owners stay sorted, so rows stay grouped
+        owners, gallery.owners[:kept] = np.unique(self.owners[:n][keep], return_inverse=True)
+        gallery.ids[:kept] = self.ids[:n][keep]
+        gallery.names[:kept] = self.names[:n][keep]
+        gallery.image_urls[:kept] = self.image_urls[:n][keep]
+        gallery.student_count = len(owners)
+        gallery.size = kept
+        if self.index is not None:
+            # Kept rows that were indexed stay a prefix of the new gallery, everything after them is the tail
+            gallery.index = self.index.subset(np.flatnonzero(keep[:self.index.size]))
+        for sid, name, image_url, encoding in additions:
+            gallery.add(sid, name, image_url, encoding)
+        return gallery
+
+    def student(self, index):
+        """Return (id, name, image_url) for a row index"""
+        return self.ids[index], self.names[index], self.image_urls[index]
+
+    def distances(self, encodings, rows=None):
+        """Euclidean distance matrix (faces x gallery, or faces x rows) for a batch of encodings"""
+        matrix, sq_norms = self.encodings, self.sq_norms
+        n = min(self.size, len(matrix), len(sq_norms))
+        if rows is None:
+            matrix, sq_norms = matrix[:n], sq_norms[:n]
+        else:
+            matrix, sq_norms = matrix[rows], sq_norms[rows]
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        # |q - g|^2 = |q|^2 + |g|^2 - 2 q.g, computed for every pair in one GEMM
+        sq = np.einsum('ij,ij->i', queries, queries)[:, None] + sq_norms[None, :]
+        sq -= 2.0 * (queries @ matrix.T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def reduce(self, dist, starts):
+        """Collapse (faces x rows) template distances, grouped by student at `starts`, into (faces x students)"""
+        if self.reduction == 'mean':
+            counts = np.diff(np.append(starts, dist.shape[1]))
+            return np.add.reduceat(dist, starts, axis=1) / counts
+        return np.minimum.reduceat(dist, starts, axis=1)
+
+    def match(self, encodings, k=2, exact=False, nprobe=None):
+        """
+        Return the top-k students and the best/second-best margin for every encoding.
+
+        Indices are gallery rows (the first template of each matched student)
+        so student() works on them; distances are per-student reductions.
+        """
+        faces = len(encodings)
+        if faces == 0 or self.size == 0:
+            return _empty_result(faces, k)
+        segments = self.segments()
+        templated = len(segments) - 1 < self.size
+        index, quantized = self.index, self.quantized
+        if exact or (index is None and quantized is None):
+            dist = self.distances(encodings)
+            if not templated:
+                return top_k(dist, k)
+            found = top_k(self.reduce(dist, segments[:-1]), k)
+            valid = found.indices >= 0
+            found.indices[valid] = segments[found.indices[valid]]
+            return found
+
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        # Rows appended after the index / quantized copy was built are always scanned exactly
+        if index is not None:
+            tail = np.arange(index.size, self.size)
+            shortlists = (index.candidates(query, nprobe) for query in queries)
+        else:
+            tail = np.arange(quantized.size, self.size)
+            shortlists = quantized.shortlist(queries, max(k, self.shortlist))
+        result = _empty_result(faces, k)
+        for i, (query, candidates) in enumerate(zip(queries, shortlists)):
+            rows = np.concatenate((candidates, tail))
+            if len(rows) == 0:
+                continue
+            if not templated:
+                # Exact float32 rerank of the shortlist
+                found = top_k(self.distances(query, rows), k)
+            else:
+                # Every template of each shortlisted student is reranked and reduced per student
+                rows, starts = expand_segments(segments, np.unique(self.owners[rows]))
+                found = top_k(self.reduce(self.distances(query, rows), starts), k)
+                valid = found.indices[0] >= 0
+                found.indices[0, valid] = starts[found.indices[0, valid]]
+            valid = found.indices[0] >= 0
+            result.indices[i, valid] = rows[found.indices[0, valid]]
+            result.distances[i] = found.distances[0]
+            result.margins[i] = found.margins[0]
+        return result
+
+
+def expand_segments(segments, students):
+    """All rows of the given students, and where each student's rows start in that list"""
+    lengths = segments[students + 1] - segments[students]
+    starts = np.cumsum(lengths) - lengths
+    rows = np.repeat(segments[students] - starts, lengths) + np.arange(lengths.sum())
+    return rows, starts
+
+
+def top_k(dist, k):
+    """Select the k smallest distances per row of a (faces x candidates) matrix"""
+    faces, n = dist.shape
+    kk = min(k, n)
+    if kk < n:
+        part = np.argpartition(dist, kk - 1, axis=1)[:, :kk]
+    else:
+        part = np.broadcast_to(np.arange(n), (faces, n))
+    part_dist = np.take_along_axis(dist, part, axis=1)
+    order = np.argsort(part_dist, axis=1)
+    result = _empty_result(faces, k)
+    result.indices[:, :kk] = np.take_along_axis(part, order, axis=1)
+    result.distances[:, :kk] = np.take_along_axis(part_dist, order, axis=1)
+    if kk > 1:
+        result.margins[:] = result.distances[:, 1] - result.distances[:, 0]
+    return result
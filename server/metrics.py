@@ -0,0 +1,207 @@
+"""
+Minimal Prometheus-style metrics for the recognition server.
+
+Counters and histograms are plain Python objects updated in place (one lock
+per labelled series, a bisect per histogram observation), so instrumenting
+the per-frame path costs microseconds. Values that already live elsewhere,
+like queue depths or the replay backlog, are read only when /metrics is
+scraped through registered callbacks. REGISTRY.render() produces the
+Prometheus text exposition format.
+"""
+
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+DISTANCE_BUCKETS = (0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6, 0.65, 0.7, 0.8, 1.0)
+FACES_BUCKETS = (0, 1, 2, 3, 5, 8, 13)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterSeries:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class _HistogramSeries:
+    def __init__(self, buckets):
+        self.lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        series = self.series.get(values)
+        if series is None:
+            with self.lock:
+                series = self.series.setdefault(values, self.new_series())
+        return series
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self):
+        lines = self.header()
+        for values, series in sorted(self.series.items()):
+            lines.append(f"{self.name}{format_labels(self.label_names, values)} {format_value(series.value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = self.header()
+        for values, series in sorted(self.series.items()):
+            with series.lock:
+                counts, total = list(series.counts), series.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = format_labels(self.label_names, values, [('le', format_value(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = format_labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples are read from `collect()` at scrape time"""
+
+    def __init__(self, name, help, labels=(), kind='gauge', collect=None):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.kind = kind
+        self.collect = collect  # Returns [(label values tuple, value)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            samples = self.collect() if self.collect is not None else []
+        except Exception:
+            samples = []
+        for values, value in samples:
+            if value is None:
+                continue
+            lines.append(f"{self.name}{format_labels(self.label_names, values)} {format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name, help, collect, labels=(), kind='gauge'):
+        return self.register(CallbackMetric(name, help, labels, kind, collect))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# --- Recognition loop ---
+FRAMES_CAPTURED = REGISTRY.counter('face_frames_captured_total', 'Frames read from a camera', ['camera'])
+FRAMES_GATED = REGISTRY.counter('face_frames_gated_total', 'Frames skipped by the motion gate', ['camera'])
+FRAMES_PROCESSED = REGISTRY.counter('face_frames_processed_total', 'Frames that went through detection', ['camera'])
+CAPTURE_SECONDS = REGISTRY.histogram('face_capture_seconds', 'Time to read one frame from a camera', ['camera'])
+STAGE_SECONDS = REGISTRY.histogram('face_stage_seconds', 'Latency of a recognition stage', ['camera', 'stage'])
+FACES_PER_FRAME = REGISTRY.histogram('face_faces_per_frame', 'Faces detected per processed frame', ['camera'],
+                                     buckets=FACES_BUCKETS)
+MATCH_DISTANCE = REGISTRY.histogram('face_match_distance', 'Distance to the best gallery match', ['camera'],
+                                    buckets=DISTANCE_BUCKETS)
+RECOGNITIONS = REGISTRY.counter('face_recognitions_total', 'Gallery match results', ['camera', 'result'])
+
+# --- Attendance and database ---
+ATTENDANCE_MARKS = REGISTRY.counter('face_attendance_marks_total', 'mark_attendance results', ['result'])
+ATTENDANCE_MARK_SECONDS = REGISTRY.histogram('face_attendance_mark_seconds', 'mark_attendance latency')
+DB_SECONDS = REGISTRY.histogram('face_db_request_seconds', 'Supabase request latency', ['operation'])
+DB_ERRORS = REGISTRY.counter('face_db_errors_total', 'Failed Supabase requests', ['operation'])
+
+# --- Gallery ---
+LOAD_FACES_SECONDS = REGISTRY.histogram('face_load_faces_seconds', 'Full gallery load latency',
+                                        buckets=SLOW_BUCKETS)
+
+# --- Streaming ---
+MJPEG_ENCODE_SECONDS = REGISTRY.histogram('face_mjpeg_encode_seconds', 'Resize and JPEG-encode of a stream frame',
+                                          ['camera'])
+MJPEG_FRAMES_SENT = REGISTRY.counter('face_mjpeg_frames_sent_total', 'Stream frames written to clients', ['camera'])
@@ -0,0 +1,93 @@
+"""
+Encode-once MJPEG broadcasting for /video_feed.
+
+One producer thread per camera resizes and JPEG-encodes each new frame once
+and publishes the bytes with a version number. Every connected client waits
+on a condition variable for a newer version, so ten viewers cost one encode
+per frame, nobody polls, and no client is sent the same frame twice. The
+producer only runs while at least one client is connected.
+"""
+
+import threading
+import time
+
+import cv2
+
+from metrics import MJPEG_ENCODE_SECONDS, MJPEG_FRAMES_SENT
+
+BOUNDARY = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+
+class MjpegBroadcaster:
+    def __init__(self, camera, size=(480, 360), quality=60, max_fps=10):
+        self.camera = camera
+        self.size = size  # Resize for web display and compress more
+        self.quality = quality
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.cond = threading.Condition()
+        self.jpeg = None
+        self.version = 0
+        self.subscribers = 0
+        self.thread = None
+        self.encoded = 0
+        self.sent = 0
+
+    def ensure_producer(self):
+        # Called with self.cond held
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.produce, daemon=True)
+            self.thread.start()
+
+    def produce(self):
+        frame_version = self.camera.frame_counter
+        encode_seconds = MJPEG_ENCODE_SECONDS.labels(self.camera.name)
+        while True:
+            with self.cond:
+                if self.subscribers == 0:
+                    self.thread = None
+                    return
+            started = time.monotonic()
+            frame, frame_version = self.camera.wait_frame(frame_version, timeout=1.0)
+            if frame is None:
+                continue
+            encode_started = time.perf_counter()
+            try:
+                display_frame = cv2.resize(frame, self.size)
+                ret, buffer = cv2.imencode('.jpg', display_frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                encode_seconds.observe(time.perf_counter() - encode_started)
+            except Exception as e:
+                print(f"⚠️ Stream encode error on '{self.camera.name}': {e}")
+                continue
+            if ret:
+                with self.cond:
+                    self.jpeg = BOUNDARY + buffer.tobytes() + b'\r\n'
+                    self.version += 1
+                    self.encoded += 1
+                    self.cond.notify_all()
+            # Cap the display frame rate so streaming never competes with recognition
+            delay = self.min_interval - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def subscribe(self, is_active):
+        """Generator of multipart JPEG parts for one client"""
+        with self.cond:
+            self.subscribers += 1
+            self.ensure_producer()
+            last = self.version
+        sent = MJPEG_FRAMES_SENT.labels(self.camera.name)
+        try:
+            while is_active():
+                with self.cond:
+                    if not self.cond.wait_for(lambda: self.version != last, timeout=1.0):
+                        continue
+                    jpeg, last = self.jpeg, self.version
+                self.sent += 1
+                sent.inc()
+                yield jpeg
+        finally:
+            with self.cond:
+                self.subscribers -= 1
+
+    def stats(self):
+        return {'clients': self.subscribers, 'frames_encoded': self.encoded, 'frames_sent': self.sent}
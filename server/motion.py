@@ -0,0 +1,90 @@
+"""
+Cheap motion gate in front of face detection.
+
+Runs in the capture thread on every frame: the frame is shrunk to a tiny
+grayscale thumbnail and compared with a running-average background. Frames
+of a still scene are never handed to detection, and the bounding box of the
+changed pixels is passed along so detection can be restricted to it.
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    def __init__(self, size=(64, 48), threshold=25, min_area=0.003, learning_rate=0.05,
+                 hold=1.0, padding=0.25, max_roi_area=0.6):
+        self.size = size  # Thumbnail used for differencing
+        self.threshold = threshold  # Grey-level change that counts as a changed pixel
+        self.min_area = min_area  # Share of changed pixels that counts as motion
+        self.learning_rate = learning_rate  # How quickly the background absorbs changes
+        self.hold = hold  # Seconds frames keep passing after the last motion
+        self.padding = padding  # ROI grows by this share of its size on every side
+        self.max_roi_area = max_roi_area  # Larger changes are detected on the whole frame
+        self.lock = threading.Lock()
+        self.background = None
+        self.last_motion = None
+        self.moving = False
+        self.checked = 0
+        self.still = 0
+        self.wakeups = 0
+
+    def update(self, frame, now=None):
+        """
+        Compare a BGR frame with the background.
+
+        Returns (moving, started, roi): whether the scene is changing (or
+        changed within `hold` seconds), whether that just began, and the
+        changed region as (x0, y0, x1, y1) in frame pixels, or None for the
+        whole frame.
+        """
+        now = time.monotonic() if now is None else now
+        thumb = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        thumb = cv2.GaussianBlur(thumb, (5, 5), 0).astype(np.float32)
+        with self.lock:
+            self.checked += 1
+            if self.background is None:
+                self.background = thumb
+                return False, False, None
+            mask = cv2.absdiff(thumb, self.background) > self.threshold
+            cv2.accumulateWeighted(thumb, self.background, self.learning_rate)
+
+            changed = np.count_nonzero(mask)
+            roi = None
+            if changed >= self.min_area * mask.size:
+                self.last_motion = now
+                roi = self.region(mask, frame.shape)
+            moving = self.last_motion is not None and now - self.last_motion <= self.hold
+            started = moving and not self.moving
+            self.moving = moving
+            if started:
+                self.wakeups += 1
+            if not moving:
+                self.still += 1
+            return moving, started, roi
+
+    def region(self, mask, shape):
+        ys, xs = np.nonzero(mask)
+        height, width = shape[:2]
+        sx, sy = width / mask.shape[1], height / mask.shape[0]
+        x0, x1 = xs.min() * sx, (xs.max() + 1) * sx
+        y0, y1 = ys.min() * sy, (ys.max() + 1) * sy
+        pad = self.padding * max(x1 - x0, y1 - y0)
+        x0, y0 = max(0, int(x0 - pad)), max(0, int(y0 - pad))
+        x1, y1 = min(width, int(x1 + pad)), min(height, int(y1 + pad))
+        if (x1 - x0) * (y1 - y0) > self.max_roi_area * width * height:
+            return None
+        return x0, y0, x1, y1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'moving': self.moving,
+                'frames_checked': self.checked,
+                'frames_still': self.still,
+                'still_ratio': round(self.still / self.checked, 3) if self.checked else 0.0,
+                'wakeups': self.wakeups,
+            }
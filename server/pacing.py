@@ -0,0 +1,161 @@
+"""
+Adaptive detection pacing per camera.
+
+Instead of detecting on every frame a worker can grab, each camera gets a
+DetectionPacer that measures how long detection, encoding and matching take
+and picks two knobs from those measurements:
+
+- the interval between detections: as short as a per-camera CPU budget
+  allows while faces are present, backing off towards `idle_interval`
+  while the scene is empty;
+- the detection resolution: stepped down when the estimated
+  time-to-recognition (wait for the next detection plus all stage
+  latencies) exceeds the target, stepped up when there is plenty of
+  headroom so smaller, more distant faces are found.
+
+An empty scene never drops below `idle_level`: dlib HOG needs faces of
+about 80 px, so a resolution that is too small never finds the distant
+faces that would switch the pacer to active. When motion wakes the pacer
+and the next detection still finds nobody, the resolution is stepped up
+once per wake-up, since something moved that a small frame may be missing.
+
+Every change of state or resolution is logged with its reason and exported
+through stats() for /health.
+"""
+
+import threading
+import time
+from collections import deque
+
+RESOLUTIONS = ((160, 120), (240, 180), (320, 240), (480, 360))
+
+
+class DetectionPacer:
+    def __init__(self, target_latency=0.5, cpu_budget=0.5, min_interval=0.05, idle_interval=1.0,
+                 idle_after=2.0, resolutions=RESOLUTIONS, level=0, idle_level=2, smoothing=0.2, settle_samples=5):
+        self.target_latency = target_latency  # Seconds from a face appearing to its match
+        self.cpu_budget = cpu_budget  # Share of one core this camera's detection may use
+        self.min_interval = min_interval
+        self.idle_interval = idle_interval  # Slowest detection rate for an empty scene
+        self.idle_after = idle_after  # Seconds without faces before the scene counts as empty
+        self.resolutions = resolutions
+        self.idle_level = min(idle_level, len(resolutions) - 1)  # Lowest resolution while the scene is empty
+        self.level = max(level, self.idle_level)  # Index into resolutions used for detection
+        self.smoothing = smoothing  # EWMA weight of the newest measurement
+        self.settle_samples = settle_samples  # Detections to measure before changing resolution again
+        self.lock = threading.Lock()
+        self.interval = min_interval
+        self.next_due = 0.0
+        self.stages = {'detect': None, 'encode': None, 'match': None}
+        self.samples = 0
+        self.last_faces = None
+        self.last_motion = None
+        self.searching = False  # Woken by motion and no detection has run since
+        self.active = False
+        self.detections = 0
+        self.decisions = deque(maxlen=20)
+
+    @property
+    def resolution(self):
+        return self.resolutions[self.level]
+
+    def due(self, now):
+        return now >= self.next_due
+
+    def wait_time(self, now):
+        return max(0.0, self.next_due - now)
+
+    def wake(self, now):
+        """Something changed in the scene: detect right away and at full rate"""
+        with self.lock:
+            self.next_due = now
+            self.last_motion = now
+            if not self.active:
+                self.interval = self.min_interval
+                self.searching = True
+
+    def claim(self, now):
+        """Called when a frame is handed to a detection worker"""
+        with self.lock:
+            self.next_due = now + self.interval
+            self.detections += 1
+
+    def record(self, stage, seconds):
+        with self.lock:
+            previous = self.stages[stage]
+            self.stages[stage] = seconds if previous is None else previous + self.smoothing * (seconds - previous)
+
+    def record_detection(self, seconds, faces, now):
+        """Feed one detection's latency and face count, then re-plan interval and resolution"""
+        self.record('detect', seconds)
+        with self.lock:
+            self.samples += 1
+            if faces:
+                self.last_faces = now
+            self.adjust(now)
+
+    def estimated_latency(self):
+        """Worst-case time-to-recognition: waiting for the next detection plus every stage"""
+        return self.interval + sum(value for value in self.stages.values() if value is not None)
+
+    def adjust(self, now):
+        # Called with self.lock held
+        active = self.last_faces is not None and now - self.last_faces <= self.idle_after
+        if active != self.active:
+            self.active = active
+            self.decide(now, 'faces present' if active else 'scene empty')
+
+        # Never detect more often than the CPU budget allows
+        floor = max(self.min_interval, (self.stages['detect'] or 0.0) / self.cpu_budget)
+        if not active:
+            self.interval = min(self.idle_interval, max(floor, self.interval * 1.5))
+            motion = self.last_motion is not None and now - self.last_motion <= self.idle_after
+            if self.searching and self.level < len(self.resolutions) - 1:
+                self.set_level(self.level + 1, now, 'motion without faces')
+            elif self.level != self.idle_level and not motion:
+                self.set_level(self.idle_level, now, 'scene empty')
+            self.searching = False
+            return
+
+        self.searching = False
+
+        self.interval = floor
+        if self.samples < self.settle_samples:
+            return
+        latency = self.estimated_latency()
+        if latency > self.target_latency and self.level > 0:
+            self.set_level(self.level - 1, now, f'latency {latency:.3f}s over target')
+        elif latency < self.target_latency / 2 and self.level < len(self.resolutions) - 1:
+            self.set_level(self.level + 1, now, f'latency {latency:.3f}s has headroom')
+
+    def set_level(self, level, now, reason):
+        self.level = level
+        # Detection cost depends on resolution, so measure afresh before the next change
+        self.stages['detect'] = None
+        self.samples = 0
+        self.decide(now, reason)
+
+    def decide(self, now, reason):
+        self.decisions.append({
+            'time': time.time(),
+            'reason': reason,
+            'resolution': list(self.resolution),
+            'interval': round(self.interval, 3),
+        })
+
+    def stats(self):
+        with self.lock:
+            interval = self.interval
+            detect = self.stages['detect']
+            return {
+                'state': 'active' if self.active else 'idle',
+                'resolution': list(self.resolution),
+                'idle_resolution': list(self.resolutions[self.idle_level]),
+                'interval_s': round(interval, 3),
+                'stage_latency_s': {k: round(v, 4) if v is not None else None for k, v in self.stages.items()},
+                'estimated_latency_s': round(self.estimated_latency(), 3),
+                'target_latency_s': self.target_latency,
+                'cpu_share': round(detect / interval, 3) if detect is not None and interval else None,
+                'detections': self.detections,
+                'decisions': list(self.decisions),
+            }
@@ -0,0 +1,59 @@
+"""
+Building blocks for the staged recognition loop.
+
+Stages are plain threads connected by DropOldestQueue: a producer never
+blocks and a consumer that falls behind simply skips to the freshest items,
+so work is paced by how fast the slowest stage can compute rather than by
+fixed sleeps or frame-skip counters.
+"""
+
+import threading
+from collections import deque
+
+
+class QueueClosed(Exception):
+    pass
+
+
+class DropOldestQueue:
+    def __init__(self, maxsize=1):
+        self.items = deque()
+        self.maxsize = maxsize
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+        self.put_count = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, item):
+        """Enqueue without blocking; the oldest item is discarded when full"""
+        with self.cond:
+            if self.closed:
+                return
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.put_count += 1
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Dequeue the oldest retained item; returns None on timeout, raises QueueClosed once closed and drained"""
+        with self.cond:
+            if not self.items and not self.closed:
+                self.cond.wait(timeout)
+            if self.items:
+                return self.items.popleft()
+            if self.closed:
+                raise QueueClosed()
+            return None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def stats(self):
+        return {'depth': len(self.items), 'dropped': self.dropped, 'queued': self.put_count}
@@ -0,0 +1,76 @@
+"""
+Compact quantized copy of the gallery for fast shortlisting.
+
+Encodings are stored as int8 codes (per-dimension affine quantization,
+128 bytes per face) or float16 (256 bytes per face) in one contiguous
+array, next to the float32 gallery matrix (512 bytes per face). A scan
+converts the codes to float32 a few hundred rows at a time, so the working
+buffer stays in cache, and returns the `count` nearest rows per query.
+FaceGallery then reranks that shortlist with exact float32 distances, so
+reported distances, and therefore tolerance decisions, are the exact ones
+whenever the true nearest face makes the shortlist.
+"""
+
+import numpy as np
+
+KINDS = ('int8', 'float16')
+
+
+class QuantizedMatrix:
+    def __init__(self, kind='int8', chunk_rows=512):
+        if kind not in KINDS:
+            raise ValueError(f"unknown gallery quantization {kind!r}, expected one of {KINDS}")
+        self.kind = kind
+        self.chunk_rows = chunk_rows  # Rows dequantized per step; 512 x 128 float32 fits in L2
+        self.size = 0
+        self.codes = None
+        self.scale = None  # Per-dimension step (int8 only)
+        self.bias = None  # Per-dimension value of code 0 (int8 only)
+        self.sq_norms = None  # Squared norms of the dequantized rows
+
+    def build(self, encodings):
+        """Quantize the first len(encodings) gallery rows"""
+        points = np.ascontiguousarray(encodings, dtype=np.float32)
+        if self.kind == 'float16':
+            self.codes = points.astype(np.float16)
+            decoded = self.codes.astype(np.float32)
+        else:
+            low, high = points.min(axis=0), points.max(axis=0)
+            self.scale = np.maximum((high - low) / 254.0, 1e-12).astype(np.float32)
+            self.bias = (low + 127.0 * self.scale).astype(np.float32)
+            self.codes = np.clip(np.rint((points - self.bias) / self.scale), -127, 127).astype(np.int8)
+            decoded = self.codes * self.scale + self.bias
+        self.sq_norms = np.einsum('ij,ij->i', decoded, decoded)
+        self.size = len(points)
+        return self
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes if self.codes is not None else 0
+
+    def sq_distances(self, queries):
+        """Approximate squared distances (faces x size) from float32 queries to the quantized rows"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(len(queries), -1)
+        if self.kind == 'int8':
+            # q.(c * scale + bias) = (q * scale).c + q.bias, so the codes are never fully decoded
+            weights, offsets = queries * self.scale, queries @ self.bias
+        else:
+            weights, offsets = queries, 0.0
+        dots = np.empty((len(queries), self.size), dtype=np.float32)
+        buffer = np.empty((min(self.chunk_rows, self.size), self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, self.size, self.chunk_rows):
+            chunk = self.codes[start:start + self.chunk_rows]
+            decoded = buffer[:len(chunk)]
+            np.copyto(decoded, chunk)
+            np.matmul(weights, decoded.T, out=dots[:, start:start + len(chunk)])
+        dots += np.asarray(offsets, dtype=np.float32).reshape(-1, 1)
+        sq = np.einsum('ij,ij->i', queries, queries)[:, None] + self.sq_norms[None, :]
+        sq -= 2.0 * dots
+        return sq
+
+    def shortlist(self, queries, count):
+        """Row ids (faces x count) of the `count` nearest quantized rows per query, in no particular order"""
+        sq = self.sq_distances(queries)
+        if count >= self.size:
+            return np.broadcast_to(np.arange(self.size), (len(sq), self.size))
+        return np.argpartition(sq, count - 1, axis=1)[:, :count]
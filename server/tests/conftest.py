@@ -0,0 +1,13 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The server modules are plain top-level modules next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
@@ -0,0 +1,163 @@
+import sqlite3
+
+import pytest
+
+from attendance_journal import AttendanceJournal
+from attendance_ledger import AttendanceLedger, current_session
+from attendance_writer import ATTENDANCE_CONFLICT, AttendanceWriter, is_rejection
+from bench import FakeSupabase
+
+DAY, SESSION = current_session()
+
+
+class APIError(Exception):
+    """Shaped like postgrest's APIError: the PostgreSQL error code, no HTTP status"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class RejectingSupabase(FakeSupabase):
+    """Refuses the whole upsert when it contains a student the database does not know"""
+
+    def __init__(self, unknown=(), outage=False):
+        super().__init__(latency=0)
+        self.unknown = set(unknown)
+        self.outage = outage
+
+    def upsert(self, table, rows, on_conflict, ignore_duplicates):
+        if self.outage:
+            raise ConnectionError('connection reset by peer')
+        if any(row['student_id'] in self.unknown for row in rows):
+            raise APIError('23503', 'insert or update on table "attendance" violates foreign key constraint')
+        return super().upsert(table, rows, on_conflict, ignore_duplicates)
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / 'attendance_journal.db')
+
+
+def make_writer(client, journal_path):
+    return AttendanceWriter(client, AttendanceLedger(client), AttendanceJournal(journal_path))
+
+
+def replay_all(writer):
+    ids, rows = writer.journal.pending(writer.batch_size)
+    return writer.replay(ids, rows)
+
+
+def test_submit_journals_each_student_once_per_session(journal_path):
+    writer = make_writer(FakeSupabase(latency=0), journal_path)
+    assert writer.submit('alice', SESSION, DAY, '2026-01-01T08:00:00')
+    assert not writer.submit('alice', SESSION, DAY, '2026-01-01T08:05:00')
+    assert writer.submit('alice', 'other_session', DAY, '2026-01-01T13:00:00')
+    assert writer.journal.backlog() == 2
+
+
+def test_journal_dedups_after_a_restart(journal_path):
+    client = FakeSupabase(latency=0)
+    make_writer(client, journal_path).submit('alice', SESSION, DAY, '2026-01-01T08:00:00')
+
+    # A fresh ledger that could not preload from the database still defers to the journal
+    writer = make_writer(client, journal_path)
+    assert not writer.submit('alice', SESSION, DAY, '2026-01-01T08:05:00')
+    assert not writer.ledger.add('alice', DAY, SESSION)
+    assert writer.journal.backlog() == 1
+
+
+def test_start_seeds_the_ledger_from_the_journal(journal_path):
+    client = FakeSupabase(latency=0)
+    first = make_writer(client, journal_path)
+    first.submit('alice', SESSION, DAY, '2026-01-01T08:00:00')
+    first.submit('bob', SESSION, DAY, '2026-01-01T08:01:00')
+    replay_all(first)
+
+    writer = make_writer(client, journal_path)
+    writer.start()
+    try:
+        # Sent and unsent marks alike
+        assert not writer.ledger.add('alice', DAY, SESSION)
+        assert not writer.ledger.add('bob', DAY, SESSION)
+        assert writer.ledger.add('carol', DAY, SESSION)
+    finally:
+        writer.stop()
+
+
+def test_replay_writes_batches_and_counts_duplicates(journal_path):
+    client = FakeSupabase(latency=0)
+    client.upsert('attendance', [{'student_id': 'bob', 'date': DAY, 'session_type': SESSION,
+                                  'timestamp': '2026-01-01T07:00:00'}], ATTENDANCE_CONFLICT, True)
+    writer = make_writer(client, journal_path)
+    for sid in ('alice', 'bob', 'carol'):
+        writer.submit(sid, SESSION, DAY, '2026-01-01T08:00:00')
+    assert replay_all(writer)
+    assert writer.journal.backlog() == 0
+    assert (writer.written, writer.duplicates) == (2, 1)
+    assert sorted(row['student_id'] for row in client.tables['attendance']) == ['alice', 'bob', 'carol']
+
+
+def test_rejected_rows_are_parked_without_blocking_the_batch(journal_path):
+    client = RejectingSupabase(unknown={'ghost'})
+    writer = make_writer(client, journal_path)
+    for sid in ('alice', 'bob', 'ghost', 'carol', 'dave'):
+        writer.submit(sid, SESSION, DAY, '2026-01-01T08:00:00')
+    assert replay_all(writer)
+    assert writer.journal.backlog() == 0
+    assert (writer.written, writer.rejected) == (4, 1)
+    parked = writer.journal.failed()
+    assert [mark['student_id'] for mark in parked] == ['ghost']
+    assert 'foreign key' in parked[0]['error']
+    assert writer.stats()['parked'] == 1
+
+
+def test_transport_errors_keep_the_batch_for_a_retry(journal_path):
+    client = RejectingSupabase(outage=True)
+    writer = make_writer(client, journal_path)
+    writer.submit('alice', SESSION, DAY, '2026-01-01T08:00:00')
+    assert not replay_all(writer)
+    assert writer.journal.backlog() == 1
+    assert writer.journal.failed_count() == 0
+
+    client.outage = False
+    assert replay_all(writer)
+    assert writer.journal.backlog() == 0
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+@pytest.mark.parametrize('error, rejected', [
+    (APIError('23503', 'foreign key violation'), True),
+    (APIError('22P02', 'invalid input syntax'), True),
+    (APIError('PGRST204', 'unknown column'), True),
+    (APIError('42501', 'permission denied'), False),
+    (APIError('PGRST301', 'JWT expired'), False),
+    (HTTPError(409), True),
+    (HTTPError(401), False),
+    (HTTPError(429), False),
+    (HTTPError(503), False),
+    (ConnectionError('reset'), False),
+])
+def test_is_rejection(error, rejected):
+    assert is_rejection(error) == rejected
+
+
+def test_old_journal_gains_the_error_column(journal_path):
+    conn = sqlite3.connect(journal_path)
+    conn.execute('CREATE TABLE marks (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id TEXT NOT NULL, '
+                 'date TEXT NOT NULL, session_type TEXT NOT NULL, timestamp TEXT NOT NULL, '
+                 'sent INTEGER NOT NULL DEFAULT 0, UNIQUE (student_id, date, session_type))')
+    conn.execute("INSERT INTO marks (student_id, date, session_type, timestamp) VALUES ('alice', ?, ?, 'x')",
+                 (DAY, SESSION))
+    conn.commit()
+    conn.close()
+
+    journal = AttendanceJournal(journal_path)
+    ids, _ = journal.pending(10)
+    journal.mark_failed(ids, 'rejected')
+    assert journal.failed()[0]['error'] == 'rejected'
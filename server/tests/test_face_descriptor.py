@@ -0,0 +1,46 @@
+import base64
+
+import numpy as np
+import pytest
+
+from face_descriptor import parse_descriptor, photo_tag, serialize_descriptor
+
+URL = 'https://photos/alice.jpg'
+
+
+def test_single_encoding_round_trip(rng):
+    encoding = rng.normal(0, 0.1, 128)
+    fresh, parsed = parse_descriptor(serialize_descriptor(encoding, URL), URL)
+    assert fresh
+    assert parsed.shape == (128,)
+    np.testing.assert_allclose(parsed, encoding.astype(np.float32))
+
+
+def test_templates_round_trip(rng):
+    templates = rng.normal(0, 0.1, (3, 128)).astype(np.float32)
+    fresh, parsed = parse_descriptor(serialize_descriptor(templates, URL), URL)
+    assert fresh
+    np.testing.assert_array_equal(parsed, templates)
+
+
+def test_no_face_round_trip():
+    assert parse_descriptor(serialize_descriptor(None, URL), URL) == (True, None)
+    assert parse_descriptor(serialize_descriptor(None, URL), 'https://photos/other.jpg') == (False, None)
+
+
+def test_replaced_photo_is_stale(rng):
+    text = serialize_descriptor(rng.normal(0, 0.1, 128), URL)
+    assert parse_descriptor(text, 'https://photos/other.jpg') == (False, None)
+
+
+@pytest.mark.parametrize('text', [
+    None,
+    '',
+    'garbage',
+    'f64:abc:xyz',
+    f"f32:{photo_tag(URL)}:not base64!",
+    f"f32:{photo_tag(URL)}:{base64.b64encode(np.zeros(100, '<f4').tobytes()).decode()}",
+    f"f32:{photo_tag(URL)}:{base64.b64encode(np.full(128, np.nan, '<f4').tobytes()).decode()}",
+])
+def test_unreadable_descriptors_need_a_backfill(text):
+    assert parse_descriptor(text, URL) == (False, None)
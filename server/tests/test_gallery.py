@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+
+from gallery import FaceGallery
+
+
+def make_gallery(encodings, reduction='min'):
+    rows = [(f"s{i}", f"Student {i}", f"https://photos/{i}.jpg", enc) for i, enc in enumerate(encodings)]
+    return FaceGallery(reduction=reduction).with_changes(rows)
+
+
+def brute_force(encodings, queries):
+    dist = np.linalg.norm(queries[:, None, :] - encodings[None, :, :], axis=2)
+    return np.argsort(dist, axis=1)[:, :2], np.sort(dist, axis=1)[:, :2]
+
+
+@pytest.fixture
+def encodings(rng):
+    return rng.normal(0, 0.1, (3000, 128)).astype(np.float32)
+
+
+@pytest.fixture
+def queries(rng, encodings):
+    return encodings[[0, 17, 1500, 2999]] + rng.normal(0, 0.01, (4, 128)).astype(np.float32)
+
+
+def check_match(gallery, encodings, queries, **kwargs):
+    result = gallery.match(queries, k=2, **kwargs)
+    indices, distances = brute_force(encodings, queries)
+    np.testing.assert_array_equal(result.indices, indices)
+    np.testing.assert_allclose(result.distances, distances, atol=1e-4)
+    np.testing.assert_allclose(result.margins, distances[:, 1] - distances[:, 0], atol=1e-4)
+
+
+def test_exact_match(encodings, queries):
+    check_match(make_gallery(encodings), encodings, queries)
+
+
+@pytest.mark.parametrize('kind', ['int8', 'float16'])
+def test_quantized_match_reranks_exactly(encodings, queries, kind):
+    gallery = make_gallery(encodings)
+    assert gallery.quantize(kind, min_size=0, shortlist=16) is not None
+    check_match(gallery, encodings, queries)
+
+
+def test_ivf_match_visiting_every_cell_is_exact(encodings, queries):
+    gallery = make_gallery(encodings)
+    index = gallery.build_index(min_size=0)
+    check_match(gallery, encodings, queries, nprobe=len(index.centroids))
+
+
+def test_small_gallery_skips_index_and_quantization(encodings):
+    gallery = make_gallery(encodings[:10])
+    assert gallery.build_index(min_size=5000) is None
+    assert gallery.quantize('int8', min_size=1000) is None
+
+
+def test_empty_gallery_matches_nothing(queries):
+    result = FaceGallery().match(queries)
+    assert (result.indices == -1).all()
+    assert np.isinf(result.distances).all()
+
+
+def test_with_changes_upserts_and_removes(encodings):
+    gallery = make_gallery(encodings[:5])
+    moved = encodings[100]
+    updated = gallery.with_changes(
+        [('s1', 'Renamed', 'https://photos/new.jpg', moved), ('s9', 'New', 'https://photos/9.jpg', encodings[9]),
+         ('s2', 'Student 2', 'https://photos/2.jpg', None)],
+        removed_ids=['s3'],
+    )
+    # The receiver is untouched, so readers holding it keep a consistent view
+    assert list(gallery.ids[:gallery.size]) == ['s0', 's1', 's2', 's3', 's4']
+    assert sorted(updated.ids[:updated.size]) == ['s0', 's1', 's4', 's9']
+    assert updated.student_count == 4
+
+    row = updated.match(moved[None, :]).indices[0, 0]
+    assert updated.student(row) == ('s1', 'Renamed', 'https://photos/new.jpg')
+    np.testing.assert_allclose(updated.sq_norms[:updated.size],
+                               np.einsum('ij,ij->i', updated.encodings[:updated.size], updated.encodings[:updated.size]),
+                               rtol=1e-5)
+
+
+def test_with_changes_carries_the_index(encodings, queries):
+    gallery = make_gallery(encodings)
+    index = gallery.build_index(min_size=0)
+    extra = encodings[:50] + 0.5
+    updated = gallery.with_changes([(f"new{i}", 'New', '', enc) for i, enc in enumerate(extra)], removed_ids=['s17'])
+    # Kept rows keep their cells; the added rows are scanned exactly until the index is extended
+    assert updated.index.centroids is index.centroids
+    assert updated.index.size == len(encodings) - 1
+    remaining = np.concatenate((np.delete(encodings, 17, axis=0), extra))
+    check_match(updated, remaining, queries, nprobe=len(index.centroids))
+
+    assert updated.build_index(min_size=0).centroids is index.centroids
+    assert updated.index.size == updated.size
+    check_match(updated, remaining, queries, nprobe=len(index.centroids))
+
+
+def test_index_is_retrained_after_growth(encodings, rng):
+    gallery = make_gallery(encodings[:1000])
+    index = gallery.build_index(min_size=0)
+    grown = gallery.with_changes([(f"new{i}", 'New', '', enc) for i, enc in enumerate(encodings[1000:1300])])
+    rebuilt = grown.build_index(min_size=0, retrain_growth=0.2)
+    assert rebuilt.centroids is not index.centroids
+    assert rebuilt.trained_size == 1300
+
+
+@pytest.mark.parametrize('reduction', ['min', 'mean'])
+@pytest.mark.parametrize('mode', ['exact', 'int8', 'ivf'])
+def test_templated_match_reduces_per_student(rng, reduction, mode):
+    templates = [rng.normal(0, 0.1, (1 + i % 3, 128)).astype(np.float32) for i in range(1200)]
+    gallery = make_gallery(templates, reduction=reduction)
+    assert gallery.student_count == 1200 and gallery.size == sum(len(t) for t in templates)
+    nprobe = None
+    if mode == 'int8':
+        gallery.quantize('int8', min_size=0, shortlist=64)
+    elif mode == 'ivf':
+        nprobe = len(gallery.build_index(min_size=0).centroids)
+
+    queries = np.stack([templates[5][0], templates[600][-1], templates[1199][0]]) + 0.001
+    combine = np.min if reduction == 'min' else np.mean
+    expected = np.array([[combine(np.linalg.norm(t - q, axis=1)) for t in templates] for q in queries])
+    result = gallery.match(queries, k=2, nprobe=nprobe)
+    segments = gallery.segments()
+    # Indices are the first row of each matched student
+    np.testing.assert_array_equal(result.indices, segments[np.argsort(expected, axis=1)[:, :2]])
+    np.testing.assert_allclose(result.distances, np.sort(expected, axis=1)[:, :2], atol=1e-4)
+
+
+def test_templates_round_trip_through_with_changes(rng):
+    templates = rng.normal(0, 0.1, (3, 128)).astype(np.float32)
+    gallery = make_gallery([templates[0], rng.normal(0, 0.1, 128)])
+    updated = gallery.with_changes([('s0', 'Student 0', 'https://photos/0.jpg', templates)])
+    stored, name, image_url = updated.templates('s0')
+    np.testing.assert_array_equal(stored, templates)
+    assert (name, image_url) == ('Student 0', 'https://photos/0.jpg')
+    assert updated.templates('missing') is None
+    assert updated.student_count == 2 and updated.size == 4
@@ -0,0 +1,183 @@
+import os
+
+import numpy as np
+import pytest
+
+from bench import FakeSupabase, synthetic_students
+from face_descriptor import parse_descriptor, serialize_descriptor
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    for module in ('flask', 'flask_cors', 'dotenv', 'supabase', 'cv2'):
+        pytest.importorskip(module)
+    tmpdir = tmp_path_factory.mktemp('server')
+    # Keep the server away from real credentials, caches and journals
+    os.environ['SUPABASE_URL'] = ''
+    os.environ['SUPABASE_KEY'] = ''
+    os.environ['FACE_CACHE_PATH'] = str(tmpdir / 'face_encodings.npz')
+    os.environ['ATTENDANCE_JOURNAL_PATH'] = str(tmpdir / 'attendance_journal.db')
+    os.environ['FACE_WORKER_PROCESSES'] = '0'
+    import app
+    return app
+
+
+@pytest.fixture
+def fake(server, monkeypatch):
+    fake = FakeSupabase(latency=0)
+    monkeypatch.setattr(server, 'supabase', fake)
+    return fake
+
+
+@pytest.fixture
+def system(server, fake):
+    return server.FaceRecognitionSystem()
+
+
+def seed(fake, size, rng):
+    students, encodings = synthetic_students(size, rng, serialize_descriptor)
+    fake.tables['students'] = students
+    return students, encodings
+
+
+def gallery_ids(system):
+    gallery = system.gallery
+    return set(gallery.ids[gallery.segments()[:-1]])
+
+
+def finish_backfill(system):
+    # The worker clears backfill_thread itself once the queue is empty
+    thread = system.backfill_thread
+    if thread is not None:
+        thread.join()
+
+
+def fake_backfill(monkeypatch, server, outcome):
+    """Replace the photo pipeline: outcome(student) returns an encoding, None (no face) or an exception"""
+    calls = []
+
+    def load_student_encodings(students, cache, **kwargs):
+        calls.append([s['id'] for s in students])
+        loaded, failures = [], []
+        for student in students:
+            result = outcome(student)
+            if isinstance(result, Exception):
+                failures.append({'id': student['id'], 'name': student['name'], 'stage': 'download',
+                                 'error': str(result)})
+            else:
+                loaded.append((student, result))
+        report = {'cache_hits': 0, 'downloaded': len(students), 'encoded': len(loaded), 'failures': failures,
+                  'timings': {'download_s': 0, 'encode_s': 0, 'wall_s': 0}}
+        return loaded, report
+
+    monkeypatch.setattr(server, 'load_student_encodings', load_student_encodings)
+    return calls
+
+
+def test_full_load_pages_past_max_rows(system, fake, rng):
+    students, _ = seed(fake, 2500, rng)
+    assert system.sync_gallery() == {'full': True, 'ok': True}
+    assert system.gallery.student_count == 2500
+    assert len(system.roster) == 2500
+    assert system.sync_cursor == max(s['updated_at'] for s in students)
+
+
+def test_delta_applies_updates_additions_and_deletions(system, fake, rng):
+    students, _ = seed(fake, 50, rng)
+    system.sync_gallery()
+
+    moved = rng.normal(0, 0.1, 128).astype(np.float32)
+    students[3].update(face_descriptor=serialize_descriptor(moved, students[3]['image_url']),
+                       updated_at='2027-01-01T00:00:00')
+    added = rng.normal(0, 0.1, 128).astype(np.float32)
+    fake.tables['students'].append({'id': 'new', 'name': 'New', 'image_url': 'https://example.invalid/new.jpg',
+                                    'face_descriptor': serialize_descriptor(added, 'https://example.invalid/new.jpg'),
+                                    'updated_at': '2027-01-01T00:00:01'})
+    del fake.tables['students'][7]
+
+    result = system.sync_gallery()
+    assert result == {'full': False, 'ok': True, 'updated': 2, 'encoding': 0, 'retrying': 0, 'removed': 1}
+    assert gallery_ids(system) == {s['id'] for s in fake.tables['students']}
+    row = system.gallery.match(moved[None, :]).indices[0, 0]
+    assert system.gallery.student(row)[0] == students[3]['id']
+
+    # Rows at the inclusive cursor are not applied twice
+    assert system.sync_gallery() == {'full': False, 'ok': True, 'updated': 0, 'encoding': 0, 'retrying': 0,
+                                     'removed': 0}
+
+
+def test_delta_pages_past_max_rows(system, fake, rng):
+    students, _ = seed(fake, 1500, rng)
+    system.sync_gallery()
+    for i, student in enumerate(students[:1200]):
+        encoding = rng.normal(0, 0.1, 128)
+        student.update(face_descriptor=serialize_descriptor(encoding, student['image_url']),
+                       updated_at=f"2027-01-01T00:{i // 60:02d}:{i % 60:02d}")
+    assert system.sync_gallery()['updated'] == 1200
+    for student in students[:1200:97]:
+        _, expected = parse_descriptor(student['face_descriptor'], student['image_url'])
+        found, *_ = system.gallery.templates(student['id'])
+        np.testing.assert_allclose(found[0], expected, atol=1e-6)
+
+
+def test_replaced_photo_is_backfilled(server, system, fake, rng, monkeypatch):
+    students, _ = seed(fake, 20, rng)
+    system.sync_gallery()
+    encoding = rng.normal(0, 0.1, 128).astype(np.float32)
+    fake_backfill(monkeypatch, server, lambda student: encoding)
+
+    students[4].update(image_url='https://example.invalid/replaced.jpg', updated_at='2027-01-01T00:00:00')
+    assert system.sync_gallery()['encoding'] == 1
+    finish_backfill(system)
+    found, _, image_url = system.gallery.templates(students[4]['id'])
+    np.testing.assert_array_equal(found[0], encoding)
+    assert image_url == 'https://example.invalid/replaced.jpg'
+    # The new descriptor is stored for the next load
+    assert parse_descriptor(students[4]['face_descriptor'], image_url)[0]
+
+
+def test_failed_photo_is_retried_with_backoff(server, system, fake, rng, monkeypatch):
+    students, _ = seed(fake, 20, rng)
+    system.sync_gallery()
+    outcomes = [IOError('503 from storage'), IOError('503 from storage')]
+    encoding = rng.normal(0, 0.1, 128).astype(np.float32)
+    calls = fake_backfill(monkeypatch, server, lambda student: outcomes.pop(0) if outcomes else encoding)
+    sid = students[4]['id']
+
+    students[4].update(image_url='https://example.invalid/replaced.jpg', updated_at='2027-01-01T00:00:00')
+    system.sync_gallery()
+    finish_backfill(system)
+    assert sid not in gallery_ids(system)
+    _, attempts, retry_at = system.backfill_retries[sid]
+    assert attempts == 1
+
+    # Not retried before the backoff expires
+    assert system.sync_gallery()['retrying'] == 0
+    # Each failure doubles the wait
+    monkeypatch.setattr(server.time, 'monotonic', lambda: retry_at)
+    assert system.sync_gallery()['retrying'] == 1
+    finish_backfill(system)
+    _, attempts, second_retry_at = system.backfill_retries[sid]
+    assert attempts == 2
+    assert second_retry_at - retry_at == 2 * system.retry_backoff
+
+    monkeypatch.setattr(server.time, 'monotonic', lambda: second_retry_at)
+    assert system.sync_gallery()['retrying'] == 1
+    finish_backfill(system)
+    assert sid in gallery_ids(system)
+    assert sid not in system.backfill_retries
+    assert calls == [[sid]] * 3
+
+
+def test_deleted_student_drops_its_retry(server, system, fake, rng, monkeypatch):
+    students, _ = seed(fake, 20, rng)
+    system.sync_gallery()
+    fake_backfill(monkeypatch, server, lambda student: IOError('503 from storage'))
+    students[4].update(image_url='https://example.invalid/replaced.jpg', updated_at='2027-01-01T00:00:00')
+    system.sync_gallery()
+    finish_backfill(system)
+    assert students[4]['id'] in system.backfill_retries
+
+    del fake.tables['students'][4]
+    assert system.sync_gallery()['removed'] == 1
+    assert system.backfill_retries == {}
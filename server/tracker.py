@@ -0,0 +1,144 @@
+"""
+Lightweight face tracker.
+
+Detections of consecutive processed frames are associated by IoU (with a
+centroid-distance fallback for fast movement). A track carries the identity
+found for it, so a student standing in front of the camera is encoded and
+searched once, then only re-verified every few seconds. Unidentified tracks
+are retried at a short interval rather than on every frame.
+
+Boxes are (top, right, bottom, left) tuples as returned by face_recognition.
+"""
+
+import itertools
+import threading
+
+
+def iou(a, b):
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+def centroid_close(a, b, factor=0.5):
+    """True when the box centres are within `factor` box-widths of each other"""
+    ax, ay = (a[1] + a[3]) / 2.0, (a[0] + a[2]) / 2.0
+    bx, by = (b[1] + b[3]) / 2.0, (b[0] + b[2]) / 2.0
+    size = max(a[1] - a[3], b[1] - b[3], 1)
+    return (ax - bx) ** 2 + (ay - by) ** 2 <= (factor * size) ** 2
+
+
+class Track:
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.created = now
+        self.last_seen = now
+        self.last_encoded = None
+        self.last_verified = None
+        self.student = None  # (id, name, image_url) once identified
+        self.distance = None
+        self.hits = 1
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'box': list(self.box),
+            'student_id': self.student[0] if self.student else None,
+            'distance': self.distance,
+            'hits': self.hits,
+        }
+
+
+class FaceTracker:
+    def __init__(self, iou_threshold=0.3, max_age=1.0, reverify_after=3.0, retry_unknown=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age  # Seconds a track survives without a detection
+        self.reverify_after = reverify_after  # Seconds before an identified track is encoded again
+        self.retry_unknown = retry_unknown  # Seconds between encodes of an unidentified track
+        self.tracks = []
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.encodes = 0
+        self.skipped = 0
+
+    def update(self, boxes, now):
+        """
+        Associate this frame's boxes with tracks.
+
+        Returns (track, needs_encoding) for every box, in box order.
+        """
+        with self.lock:
+            self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age]
+
+            pairs = sorted(
+                ((iou(t.box, box), ti, bi) for ti, t in enumerate(self.tracks) for bi, box in enumerate(boxes)),
+                reverse=True)
+            assigned = {}
+            used = set()
+            for score, ti, bi in pairs:
+                if ti in used or bi in assigned:
+                    continue
+                if score < self.iou_threshold and not centroid_close(self.tracks[ti].box, boxes[bi]):
+                    continue
+                assigned[bi] = self.tracks[ti]
+                used.add(ti)
+
+            result = []
+            for bi, box in enumerate(boxes):
+                track = assigned.get(bi)
+                if track is None:
+                    track = Track(next(self.ids), box, now)
+                    self.tracks.append(track)
+                else:
+                    track.box = box
+                    track.last_seen = now
+                    track.hits += 1
+                needs = self.needs_encoding(track, now)
+                if needs:
+                    track.last_encoded = now
+                    self.encodes += 1
+                else:
+                    self.skipped += 1
+                result.append((track, needs))
+            return result
+
+    def needs_encoding(self, track, now):
+        if track.last_encoded is None:
+            return True
+        # Measured from the last request so a result still in flight is not requested again
+        wait = self.retry_unknown if track.student is None else self.reverify_after
+        return now - track.last_encoded >= wait
+
+    def active(self, now):
+        """True while any track is young enough to be followed"""
+        with self.lock:
+            return any(now - t.last_seen <= self.max_age for t in self.tracks)
+
+    def identify(self, track, student, distance, now):
+        """Record the identity a gallery match found for a track (student None = no match)"""
+        with self.lock:
+            if student is None:
+                # A failed re-verification drops the identity so the track is retried soon
+                track.student = None
+                track.distance = None
+                return
+            track.student = student
+            track.distance = float(distance)
+            track.last_verified = now
+
+    def stats(self):
+        with self.lock:
+            total = self.encodes + self.skipped
+            return {
+                'tracks': len(self.tracks),
+                'identified': sum(1 for t in self.tracks if t.student is not None),
+                'encodes': self.encodes,
+                'encodes_skipped': self.skipped,
+                'skip_ratio': round(self.skipped / total, 3) if total else 0.0,
+            }
@@ -1,12 +1,26 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import toast from 'react-hot-toast';
 
+const SERVER_URL = 'http://localhost:5000';
+
 interface Recognized {
   name: string;
   image_url: string;
   status: string;
 }
 
+interface AttendanceMark {
+  student_id: string;
+  name: string;
+  date: string;
+  session_type: string;
+}
+
+type ServerEvent =
+  | { seq: number; type: 'recognition'; data: Recognized }
+  | { seq: number; type: 'attendance'; data: AttendanceMark }
+  | { seq: number; type: 'reset'; data: { camera: string | null } };
+
 export const CameraPage: React.FC = () => {
   const [recognized, setRecognized] = useState<Recognized>({
     name: '',
@@ -14,21 +28,35 @@ export const CameraPage: React.FC = () => {
     status: 'Waiting for recognition...'
   });
 
+  const lastSeq = useRef(0);
+
   const fetchRecognition = async () => {
-    const res = await fetch('http://localhost:5000/current');
+    const res = await fetch(`${SERVER_URL}/current`);
     const data = await res.json();
-    if (data.name !== recognized.name) {
-      setRecognized(data);
-      if (data.status.includes('marked')) {
-        toast.success(`${data.name}: ${data.status}`);
-      } else if (data.status.includes('already')) {
-        toast(`${data.name}: ${data.status}`, { icon: 'ℹ️' });
-      }
+    lastSeq.current = Math.max(lastSeq.current, data.seq || 0);
+    setRecognized(data);
+  };
+
+  const showRecognition = (data: Recognized) => {
+    setRecognized(data);
+    if (data.status.includes('Already')) {
+      toast(`${data.name}: ${data.status}`, { icon: 'ℹ️' });
+    } else if (data.status.includes('Marked')) {
+      toast.success(`${data.name}: ${data.status}`);
+    }
+  };
+
+  const handleEvent = (event: ServerEvent) => {
+    lastSeq.current = Math.max(lastSeq.current, event.seq);
+    if (event.type === 'recognition') {
+      showRecognition(event.data);
+    } else if (event.type === 'reset') {
+      setRecognized({ name: '', image_url: '', status: 'Waiting for recognition...' });
     }
   };
 
   const handleNext = async () => {
-    await fetch('http://localhost:5000/reset');
+    await fetch(`${SERVER_URL}/reset`);
     setRecognized({
       name: '',
       image_url: '',
@@ -37,8 +65,41 @@ export const CameraPage: React.FC = () => {
   };
 
   useEffect(() => {
-    const interval = setInterval(fetchRecognition, 3000);
-    return () => clearInterval(interval);
+    // Take the /current snapshot, then follow pushed events from its sequence number
+    let active = true;
+    let source: EventSource | null = null;
+
+    const longPoll = async () => {
+      while (active) {
+        try {
+          const res = await fetch(`${SERVER_URL}/events/poll?after=${lastSeq.current}`);
+          const data = await res.json();
+          if (data.missed) await fetchRecognition();
+          data.events.forEach(handleEvent);
+          lastSeq.current = Math.max(lastSeq.current, data.seq);
+        } catch {
+          await new Promise((resolve) => setTimeout(resolve, 3000));
+        }
+      }
+    };
+
+    fetchRecognition().catch(() => undefined).finally(() => {
+      if (!active) return;
+      if ('EventSource' in window) {
+        source = new EventSource(`${SERVER_URL}/events?after=${lastSeq.current}`);
+        (['recognition', 'reset'] as const).forEach((type) => {
+          source?.addEventListener(type, (e) => handleEvent(JSON.parse((e as MessageEvent).data)));
+        });
+        source.addEventListener('missed', () => { fetchRecognition().catch(() => undefined); });
+      } else {
+        longPoll();
+      }
+    });
+
+    return () => {
+      active = false;
+      source?.close();
+    };
   }, []);
 
   return (
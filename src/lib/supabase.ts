@@ -17,6 +17,7 @@ export type Database = {
           face_descriptor: string | null;
           image_url: string | null;
           created_at: string;
+          updated_at: string;
         };
         Insert: {
           id?: string;
@@ -26,6 +27,7 @@ export type Database = {
           face_descriptor?: string | null;
           image_url?: string | null;
           created_at?: string;
+          updated_at?: string;
         };
         Update: {
           id?: string;
@@ -35,6 +37,7 @@ export type Database = {
           face_descriptor?: string | null;
           image_url?: string | null;
           created_at?: string;
+          updated_at?: string;
         };
       };
       attendance: {
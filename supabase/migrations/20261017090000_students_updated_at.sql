@@ -0,0 +1,36 @@
+/*
+  # Track student changes for incremental gallery sync
+
+  1. Columns
+    - `students.updated_at` (timestamp with timezone, default now)
+
+  2. Indexes
+    - `idx_students_updated_at` for "changed since" queries
+
+  3. Triggers
+    - Bump `updated_at` when a student's name or photo changes. Writes that only
+      touch `face_descriptor` (the recognition server storing an encoding) do not
+      count as a change, so they do not echo back into the next sync.
+*/
+
+ALTER TABLE students ADD COLUMN IF NOT EXISTS updated_at timestamptz DEFAULT now();
+UPDATE students SET updated_at = created_at WHERE updated_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_students_updated_at ON students(updated_at);
+
+CREATE OR REPLACE FUNCTION touch_student_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.name IS DISTINCT FROM OLD.name
+     OR NEW.image_url IS DISTINCT FROM OLD.image_url THEN
+    NEW.updated_at = now();
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_touch_student_updated_at ON students;
+CREATE TRIGGER trigger_touch_student_updated_at
+  BEFORE UPDATE ON students
+  FOR EACH ROW
+  EXECUTE FUNCTION touch_student_updated_at();
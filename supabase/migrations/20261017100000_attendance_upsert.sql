@@ -0,0 +1,12 @@
+/*
+  # Allow bulk attendance upserts
+
+  1. Triggers
+    - Drop `trigger_prevent_duplicate_attendance`. It raised an exception on
+      duplicates before `ON CONFLICT DO NOTHING` could apply, which made a whole
+      bulk upsert fail because of one already-marked student. Duplicates are
+      still rejected by `idx_attendance_unique_daily_session`.
+*/
+
+DROP TRIGGER IF EXISTS trigger_prevent_duplicate_attendance ON attendance;
+DROP FUNCTION IF EXISTS prevent_duplicate_attendance();